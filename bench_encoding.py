@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Compares the /metrics wire formats: JSON vs MessagePack (metrics_codec schema).
+
+    python bench_encoding.py [--processes 30] [--disks 4] [--rounds 2000] [--url http://agent:28000]
+
+Without --url a synthetic document is used. Decode times include building
+dashboard Metrics when dashboard/network_data.py can be loaded (requests
+installed; PyQt6 is not needed), otherwise only the codec-level decode is measured.
+"""
+
+import argparse
+import importlib.util
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import metrics_codec
+
+
+def die(msg):
+    sys.exit(f"[bench_encoding.py] {msg}")
+
+
+def synthetic_document(processes, disks):
+    rnd = random.Random(1)
+    gb = 1024 ** 3
+    return {
+        "timestamp": int(time.time()),
+        "host": "bench-host",
+        "seq": 1700000000000,
+        "cpu": {"usage_percent": 37.5, "cores": 16},
+        "memory": {"total": 64 * gb, "used": 23 * gb + 123456789, "percent": 36.1},
+        "swap": {"total": 8 * gb, "used": 512 * 1024 ** 2, "percent": 6.3},
+        "disks": {
+            f"/mnt/disk{i}": {"total": 512 * gb, "used": rnd.randrange(512 * gb), "free": rnd.randrange(512 * gb),
+                              "percent": round(rnd.uniform(0, 100), 1)}
+            for i in range(disks)
+        },
+        "processes": [
+            {"pid": rnd.randrange(1, 99999), "name": f"process-{i}.exe", "mem": rnd.randrange(10 ** 9),
+             "cpu": round(rnd.uniform(0, 100), 1)}
+            for i in range(processes)
+        ],
+    }
+
+
+def fetch_document(url):
+    import requests
+    try:
+        r = requests.get(f"{url.rstrip('/')}/metrics", timeout=5)
+        r.raise_for_status()
+        return r.json()
+    except Exception as e:
+        die(f"Metrics fetch error: {e}")
+
+
+def load_network_data():
+    """dashboard/network_data.py on its own - the dashboard package __init__ pulls in PyQt6."""
+    path = Path(__file__).resolve().parent / "dashboard" / "network_data.py"
+    spec = importlib.util.spec_from_file_location("network_data", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed(fn, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=30)
+    parser.add_argument("--disks", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--url", help="agent base URL; benchmark its current /metrics document")
+    args = parser.parse_args()
+
+    if not metrics_codec.available():
+        die("msgpack not installed (pip install msgpack)")
+
+    doc = fetch_document(args.url) if args.url else synthetic_document(args.processes, args.disks)
+    doc.pop("rankings", None)
+
+    try:
+        nd = load_network_data()
+        json_decode = lambda body: nd._metrics_from_payload(json.loads(body))
+        binary_decode = lambda body: nd._metrics_from_compact(metrics_codec.unpack(body))
+        target = "Metrics"
+    except ImportError:
+        json_decode = json.loads
+        binary_decode = metrics_codec.unpack
+        target = "python objects (dashboard not importable)"
+
+    json_encode = lambda: json.dumps(doc, separators=(",", ":")).encode("utf-8")
+    binary_encode = lambda: metrics_codec.pack(metrics_codec.metrics_to_compact(doc))
+    json_body, binary_body = json_encode(), binary_encode()
+    metrics_codec.check_round_trip(doc)
+
+    rows = [
+        ("json", len(json_body), timed(json_encode, args.rounds), timed(lambda: json_decode(json_body), args.rounds)),
+        ("msgpack", len(binary_body), timed(binary_encode, args.rounds), timed(lambda: binary_decode(binary_body), args.rounds)),
+    ]
+    print(f"{len(doc.get('processes', []))} processes, {len(doc.get('disks', {}))} disks, "
+          f"{args.rounds} rounds, decode to {target}")
+    print(f"{'format':<10}{'bytes':>10}{'encode us':>12}{'decode us':>12}")
+    for name, size, enc, dec in rows:
+        print(f"{name:<10}{size:>10}{enc:>12.1f}{dec:>12.1f}")
+    base = rows[0]
+    print(f"msgpack / json: size {rows[1][1] / base[1]:.2f}x, "
+          f"encode {rows[1][2] / base[2]:.2f}x, decode {rows[1][3] / base[3]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
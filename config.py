@@ -48,6 +48,14 @@ ANALYZER_URL = os.environ.get("ANALYZER_URL", "http://127.0.0.1:24810/analyze")
 
 METRIX_SERVER_HOST = os.environ.get("METRIX_SERVER_HOST", "0.0.0.0")
 METRIX_SERVER_PORT = _get_int("METRIX_SERVER_PORT", 28000)
+# waitress (pula wątków) albo dev (wbudowany serwer Flaska)
+METRIX_SERVER_MODE = os.environ.get("METRIX_SERVER_MODE", "waitress").strip().lower()
+METRIX_SERVER_THREADS = _get_int("METRIX_SERVER_THREADS", 16)
+# każdy klient /metrics/stream trzyma jeden wątek - reszta zostaje dla zwykłych tras
+METRIX_SERVER_MAX_STREAMS = _get_int("METRIX_SERVER_MAX_STREAMS", max(1, METRIX_SERVER_THREADS - 4))
+METRIX_SERVER_BACKLOG = _get_int("METRIX_SERVER_BACKLOG", 64)
+METRIX_SERVER_CONNECTION_LIMIT = _get_int("METRIX_SERVER_CONNECTION_LIMIT", 100)
+METRIX_SERVER_KEEPALIVE_SEC = _get_int("METRIX_SERVER_KEEPALIVE_SEC", 120)
 
 BARRIER_REQUEST_TIMEOUT = _get_float("BARRIER_REQUEST_TIMEOUT", 1.2)
 ANALYZER_REQUEST_TIMEOUT = _get_float("ANALYZER_REQUEST_TIMEOUT", 30.0)
@@ -57,6 +65,44 @@ COMMANDS_REQUEST_TIMEOUT = _get_float("COMMANDS_REQUEST_TIMEOUT", 2.0)
 SCREENSHOT_TIMEOUT = _get_float("SCREENSHOT_TIMEOUT", 3.0)
 
 DASHBOARD_REFRESH_INTERVAL_SEC = _get_float("DASHBOARD_REFRESH_INTERVAL_SEC", 2.0)
-LIVE_SCREEN_REFRESH_MS = _get_int("LIVE_SCREEN_REFRESH_MS", 10000)
+LIVE_SCREEN_REFRESH_MS = _get_int("LIVE_SCREEN_REFRESH_MS", 1000)
+SCREENSHOT_TILE_SIZE = _get_int("SCREENSHOT_TILE_SIZE", 64)
+SCREENSHOT_DIFF_HISTORY = _get_int("SCREENSHOT_DIFF_HISTORY", 30)
+# Kodowanie zrzutów: szerokość / jakość domyślna, filtr skalowania
+# (nearest|box|bilinear|hamming|bicubic|lanczos), format jpeg|webp
+SCREENSHOT_WIDTH = _get_int("SCREENSHOT_WIDTH", 800)
+SCREENSHOT_MAX_WIDTH = _get_int("SCREENSHOT_MAX_WIDTH", 1920)
+SCREENSHOT_QUALITY = _get_int("SCREENSHOT_QUALITY", 65)
+SCREENSHOT_RESAMPLE = os.environ.get("SCREENSHOT_RESAMPLE", "bilinear")
+SCREENSHOT_FORMAT = os.environ.get("SCREENSHOT_FORMAT", "jpeg")
+SCREENSHOT_CACHE_SEC = _get_float("SCREENSHOT_CACHE_SEC", 0.5)
+# Wątek przechwytywania: klatki/s, jak długo po ostatnim żądaniu, odświeżanie listy monitorów
+SCREENSHOT_CAPTURE_FPS = _get_float("SCREENSHOT_CAPTURE_FPS", 2.0)
+SCREENSHOT_SUBSCRIBE_SEC = _get_float("SCREENSHOT_SUBSCRIBE_SEC", 10.0)
+SCREENSHOT_MONITOR_REFRESH_SEC = _get_float("SCREENSHOT_MONITOR_REFRESH_SEC", 30.0)
+
+METRICS_SAMPLE_INTERVAL_SEC = _get_float("METRICS_SAMPLE_INTERVAL_SEC", 2.0)
+METRICS_PROCESS_TOP_N = _get_int("METRICS_PROCESS_TOP_N", 30)
+METRICS_RANKING_IDLE_SEC = _get_float("METRICS_RANKING_IDLE_SEC", 60.0)
+METRICS_DELTA_HISTORY = _get_int("METRICS_DELTA_HISTORY", 30)
+METRICS_HISTORY_SIZE = _get_int("METRICS_HISTORY_SIZE", 1800)
+METRICS_STREAM_KEEPALIVE_SEC = _get_float("METRICS_STREAM_KEEPALIVE_SEC", 15.0)
+METRICS_STREAM_READ_TIMEOUT = _get_float("METRICS_STREAM_READ_TIMEOUT", 35.0)
+# sesje keep-alive poza flotą; FleetCollector dokłada po jednej na każdego swojego agenta
+DASHBOARD_HTTP_MAX_HOSTS = _get_int("DASHBOARD_HTTP_MAX_HOSTS", 32)
+DASHBOARD_HTTP_POOL_SIZE = _get_int("DASHBOARD_HTTP_POOL_SIZE", 4)
+DASHBOARD_HTTP_IDLE_SEC = _get_float("DASHBOARD_HTTP_IDLE_SEC", 60.0)
+# json (z deltami ?since=) albo msgpack (pełny dokument, stały schemat - metrics_codec.py)
+DASHBOARD_METRICS_FORMAT = os.environ.get("DASHBOARD_METRICS_FORMAT", "json").strip().lower()
+DASHBOARD_METRICS_STREAM = os.environ.get("DASHBOARD_METRICS_STREAM", "1").strip().lower() not in ("0", "false", "no", "off")
 
 BARRIER_HOST_IP_OVERRIDES = _parse_kv_map(os.environ.get("BARRIER_HOST_IP_OVERRIDES", ""))
+
+# Fleet collector: name=ip list and / or the scanner's /api/hosts
+DASHBOARD_FLEET_HOSTS = _parse_kv_map(os.environ.get("DASHBOARD_FLEET_HOSTS", ""))
+DASHBOARD_FLEET_SCANNER_URL = os.environ.get("DASHBOARD_FLEET_SCANNER_URL", "")
+DASHBOARD_FLEET_SCANNER_TIMEOUT = _get_float("DASHBOARD_FLEET_SCANNER_TIMEOUT", 5.0)
+DASHBOARD_FLEET_INTERVAL_SEC = _get_float("DASHBOARD_FLEET_INTERVAL_SEC", 5.0)
+DASHBOARD_FLEET_WORKERS = _get_int("DASHBOARD_FLEET_WORKERS", 8)
+DASHBOARD_FLEET_MAX_BACKOFF_SEC = _get_float("DASHBOARD_FLEET_MAX_BACKOFF_SEC", 60.0)
+DASHBOARD_FLEET_DISCOVERY_SEC = _get_float("DASHBOARD_FLEET_DISCOVERY_SEC", 60.0)
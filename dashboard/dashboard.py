@@ -7,6 +7,7 @@ from . import network_data as nd
 from .widgets import (
     CircularGauge,
     DiskList,
+    FleetGrid,
     LiveScreenView,
     LoadingSpinner,
     MemoryBar,
@@ -87,7 +88,7 @@ class DashboardWindow(QtWidgets.QMainWindow):
         # KOLUMNA 2: Live Screen View (CENTER)
         # -----------------------------------------------
         screen_card = QtWidgets.QFrame(); screen_card.setObjectName("card"); screen_l = QtWidgets.QVBoxLayout(screen_card)
-        screen_l.addWidget(QtWidgets.QLabel("Remote Screen (10s refresh)", objectName="title"))
+        screen_l.addWidget(QtWidgets.QLabel(f"Remote Screen ({config.LIVE_SCREEN_REFRESH_MS / 1000:g}s refresh)", objectName="title"))
         
         self.screen_view = LiveScreenView()
         screen_l.addWidget(self.screen_view)
@@ -117,12 +118,31 @@ class DashboardWindow(QtWidgets.QMainWindow):
 
         main_layout.addWidget(self.panels_widget)
         self.panels_widget.setVisible(False)
+
+        # FLOTA: kafelki wszystkich znanych hostów
+        self.fleet_card = QtWidgets.QFrame(); self.fleet_card.setObjectName("card"); fleet_l = QtWidgets.QVBoxLayout(self.fleet_card)
+        fleet_l.addWidget(QtWidgets.QLabel("Fleet", objectName="title"))
+        self.fleet_grid = FleetGrid(); self.fleet_grid.setMinimumHeight(130); fleet_l.addWidget(self.fleet_grid)
+        main_layout.addWidget(self.fleet_card)
+        self.fleet_card.setVisible(False)
         self.status = QtWidgets.QLabel("Initializing..."); main_layout.addWidget(self.status)
         
         self._metrics = None; self._current_host = None; self._current_ip = None; self._fetch_lock = threading.Lock()
+        # Push z agenta (/metrics/stream); timer odświeża wtedy tylko stan Barrier
+        self._stream = nd.MetricsStream(self._on_stream_metrics) if config.DASHBOARD_METRICS_STREAM else None
+        # Metryki całej floty w tle - przełączenie ekranu pokazuje od razu dane z cache
+        self._fleet = nd.FleetCollector(
+            {**config.BARRIER_HOST_IP_OVERRIDES, **config.DASHBOARD_FLEET_HOSTS},
+            scanner_url=config.DASHBOARD_FLEET_SCANNER_URL,
+            interval=config.DASHBOARD_FLEET_INTERVAL_SEC,
+            workers=config.DASHBOARD_FLEET_WORKERS,
+            max_backoff=config.DASHBOARD_FLEET_MAX_BACKOFF_SEC,
+            discovery_sec=config.DASHBOARD_FLEET_DISCOVERY_SEC,
+        )
+        self._fleet.start()
         
         self._clock_timer = QtCore.QTimer(self); self._clock_timer.setInterval(1000); self._clock_timer.timeout.connect(self._update_clock); self._clock_timer.start()
-        self._refresh_timer = QtCore.QTimer(self); self._refresh_timer.setInterval(int(REFRESH_INTERVAL_SEC * 1000)); self._refresh_timer.timeout.connect(self._trigger_fetch); self._refresh_timer.start()
+        self._refresh_timer = QtCore.QTimer(self); self._refresh_timer.setInterval(int(REFRESH_INTERVAL_SEC * 1000)); self._refresh_timer.timeout.connect(self._trigger_fetch); self._refresh_timer.timeout.connect(self._refresh_fleet); self._refresh_timer.start()
         self._trigger_fetch()
 
     def _base_stylesheet(self):
@@ -140,14 +160,33 @@ class DashboardWindow(QtWidgets.QMainWindow):
     def _update_clock(self): self.time_label.setText(time.strftime("%H:%M:%S"))
     def _trigger_fetch(self): threading.Thread(target=self._fetch_cycle, daemon=True).start()
 
+    def _refresh_fleet(self):
+        hosts = self._fleet.hosts()
+        self.fleet_card.setVisible(len(hosts) > 1)
+        self.fleet_grid.setHosts(hosts)
+
     def _fetch_cycle(self):
         with self._fetch_lock:
             info = nd.fetch_host_info()
-            if info: self._current_host, self._current_ip = info
+            if info and info != (self._current_host, self._current_ip):
+                self._current_host, self._current_ip = info
+                cached = self._fleet.get(*info, max_age=3 * config.DASHBOARD_FLEET_INTERVAL_SEC)
+                if cached is not None:
+                    QtCore.QMetaObject.invokeMethod(self, "_apply_state", QtCore.Qt.ConnectionType.QueuedConnection, QtCore.Q_ARG(object, cached))
+            if self._stream is not None and self._current_ip:
+                self._stream.set_target(self._current_host, self._current_ip)
+                return
             new_metrics = None
-            if self._current_ip: new_metrics = nd.fetch_remote_metrics(self._current_ip, self._current_host)
+            if self._current_ip:
+                new_metrics = nd.fetch_remote_metrics(self._current_ip, self._current_host)
+                self._fleet.observe(self._current_host, self._current_ip, new_metrics)
             QtCore.QMetaObject.invokeMethod(self, "_apply_state", QtCore.Qt.ConnectionType.QueuedConnection, QtCore.Q_ARG(object, new_metrics))
 
+    def _on_stream_metrics(self, host, ip, metrics):
+        self._fleet.observe(host, ip, metrics)
+        if (host, ip) != (self._current_host, self._current_ip): return
+        QtCore.QMetaObject.invokeMethod(self, "_apply_state", QtCore.Qt.ConnectionType.QueuedConnection, QtCore.Q_ARG(object, metrics))
+
     @QtCore.pyqtSlot(object)
     def _apply_state(self, metrics: nd.Metrics):
         self._metrics = metrics
@@ -165,7 +204,7 @@ class DashboardWindow(QtWidgets.QMainWindow):
             # Aktualizacja Tabeli Procesów
             self.proc_table.update_data(metrics.processes)
             
-            # Przekazanie IP do podglądu ekranu (uruchamia timer 10s)
+            # Przekazanie IP do podglądu ekranu (uruchamia timer odświeżania)
             self.screen_view.setIP(self._current_ip)
             
             self.status.setText(f"Status: Online — Updated: {time.strftime('%H:%M:%S')}")
@@ -1,14 +1,189 @@
+import json
+import threading
+import time
 import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection
+from urllib.parse import urlsplit
 
 import config
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+import metrics_codec
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional, Tuple
 
 BARRIER_URL = config.BARRIER_STATE_URL
 
+# --------------------------------------------------
+# HTTP: współdzielone sesje keep-alive per host
+# --------------------------------------------------
+
+@dataclass
+class HostTiming:
+    requests: int = 0
+    errors: int = 0
+    connects: int = 0
+    connect_sec: float = 0.0   # zestawianie nowych połączeń TCP
+    response_sec: float = 0.0  # od wysłania do nagłówków odpowiedzi (z connect)
+    transfer_sec: float = 0.0  # czytanie body
+
+    def summary(self) -> Dict[str, float]:
+        n = max(1, self.requests)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "connects": self.connects,
+            "avg_connect_ms": 1000.0 * self.connect_sec / max(1, self.connects),
+            "avg_response_ms": 1000.0 * self.response_sec / n,
+            "avg_transfer_ms": 1000.0 * self.transfer_sec / n,
+        }
+
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        _sessions.record_connect(f"{self.host}:{self.port}", time.perf_counter() - started)
+        return sock
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": HTTPSConnectionPool,
+        }
+
+class SessionPool:
+    """
+    One keep-alive requests.Session per host:port, at most `max_hosts` of them
+    plus whatever was reserve()d (least recently used is closed first);
+    sessions unused for `idle_sec` are closed as well. Keeps per-host
+    connect / response / transfer timings.
+    """
+
+    def __init__(self, max_hosts: int, pool_size: int, idle_sec: float):
+        self.base_hosts = max(1, max_hosts)
+        self.max_hosts = self.base_hosts
+        self.pool_size = max(1, pool_size)
+        self.idle_sec = idle_sec
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Tuple[requests.Session, float]]" = OrderedDict()
+        self._timings: Dict[str, HostTiming] = {}
+
+    def _timing(self, host: str) -> HostTiming:
+        t = self._timings.get(host)
+        if t is None:
+            t = self._timings[host] = HostTiming()
+        return t
+
+    def session(self, host: str) -> requests.Session:
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            entry = self._sessions.pop(host, None)
+            for h, (s, used) in list(self._sessions.items()):
+                if now - used > self.idle_sec:
+                    stale.append(self._sessions.pop(h)[0])
+            while len(self._sessions) >= self.max_hosts:
+                stale.append(self._sessions.popitem(last=False)[1][0])
+            if entry is None:
+                s = requests.Session()
+                adapter = _TimedAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+            else:
+                s = entry[0]
+            self._sessions[host] = (s, now)
+        for old in stale:
+            try: old.close()
+            except Exception: pass
+        return s
+
+    def reserve(self, hosts: int):
+        """Room for `hosts` more sessions on top of max_hosts (the fleet polls every agent each cycle)."""
+        with self._lock:
+            self.max_hosts = self.base_hosts + max(0, hosts)
+
+    def record_connect(self, host: str, seconds: float):
+        with self._lock:
+            t = self._timing(host)
+            t.connects += 1
+            t.connect_sec += seconds
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        parts = urlsplit(url)
+        host = f"{parts.hostname}:{parts.port or (443 if parts.scheme == 'https' else 80)}"
+        session = self.session(host)
+        started = time.perf_counter()
+        try:
+            r = session.request(method, url, **kwargs)
+        except Exception:
+            with self._lock:
+                self._timing(host).errors += 1
+            raise
+        total = time.perf_counter() - started
+        response = r.elapsed.total_seconds()
+        with self._lock:
+            t = self._timing(host)
+            t.requests += 1
+            t.response_sec += response
+            if not kwargs.get("stream"):
+                t.transfer_sec += max(0.0, total - response)
+        return r
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {host: t.summary() for host, t in self._timings.items()}
+
+_sessions = SessionPool(config.DASHBOARD_HTTP_MAX_HOSTS, config.DASHBOARD_HTTP_POOL_SIZE, config.DASHBOARD_HTTP_IDLE_SEC)
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    return _sessions.request("GET", url, **kwargs)
+
+def http_post(url: str, **kwargs) -> requests.Response:
+    return _sessions.request("POST", url, **kwargs)
+
+def http_stats() -> Dict[str, Dict[str, float]]:
+    """Per host:port request counts and average connect / response / transfer times."""
+    return _sessions.stats()
+
 COMMANDS = {}
 _last_known_host = None
 
+class MetricsBases:
+    """
+    Last Metrics per agent IP - the base for delta answers (?since=<seq>,
+    Last-Event-ID). Each consumer (foreground fetch, MetricsStream,
+    FleetCollector) has its own, so it never sends a seq another thread
+    received and gets a patch it cannot apply.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bases: Dict[str, "Metrics"] = {}
+
+    def put(self, ip: str, m: "Metrics") -> "Metrics":
+        with self.lock:
+            self.bases[ip] = m
+        return m
+
+    def seq(self, ip: str) -> int:
+        with self.lock:
+            m = self.bases.get(ip)
+            return m.seq if m is not None else 0
+
+    def discard(self, ip: str):
+        with self.lock:
+            self.bases.pop(ip, None)
+
+# bazy delt dla fetch_remote_metrics() (timer dashboardu)
+_metrics_state = MetricsBases()
+
 @dataclass
 class Metrics:
     cpu_percent: float = 0.0
@@ -19,13 +194,14 @@ class Metrics:
     swap_total: float = 1.0
     disks: Dict[str, Dict[str, float]] = field(default_factory=dict)
     processes: List[Dict] = field(default_factory=list)
+    seq: int = 0
 
     def memory_percent(self):
         return 0.0 if self.memory_total == 0 else (self.memory_used / self.memory_total) * 100.0
 
 def fetch_host_info() -> Optional[Tuple[str, str]]:
     try:
-        r = requests.get(BARRIER_URL, timeout=config.BARRIER_REQUEST_TIMEOUT)
+        r = http_get(BARRIER_URL, timeout=config.BARRIER_REQUEST_TIMEOUT)
         r.raise_for_status()
         data = r.json()
         server = data.get("server", {})
@@ -40,53 +216,406 @@ def fetch_host_info() -> Optional[Tuple[str, str]]:
     except Exception:
         return None
 
+def _binary_enabled() -> bool:
+    return config.DASHBOARD_METRICS_FORMAT == "msgpack" and metrics_codec.available()
+
+def _accept_headers() -> Dict[str, str]:
+    if _binary_enabled():
+        return {"Accept": f"{metrics_codec.MIMETYPE}, application/json;q=0.5"}
+    return {}
+
+def _decode(r: requests.Response):
+    """Body as MessagePack or JSON, whichever the agent answered with."""
+    if r.headers.get("Content-Type", "").startswith(metrics_codec.MIMETYPE):
+        return metrics_codec.unpack(r.content)
+    return r.json()
+
 def _update_commands_cache(ip: str):
     global COMMANDS
     try:
         url = f"http://{ip}:{config.METRIX_SERVER_PORT}/command_list"
-        r = requests.get(url, timeout=config.COMMANDS_REQUEST_TIMEOUT)
+        r = http_get(url, headers=_accept_headers(), timeout=config.COMMANDS_REQUEST_TIMEOUT)
         if r.status_code == 200:
-            COMMANDS.update(r.json())
+            COMMANDS.update(_decode(r))
     except Exception:
         pass
 
-def fetch_remote_metrics(ip: str, hostname: str) -> Optional[Metrics]:
+def _metrics_from_payload(data: Dict) -> Metrics:
+    m = Metrics()
+    cpu = data.get("cpu", {})
+    m.cpu_percent = float(cpu.get("usage_percent", 0.0))
+    m.cores = cpu.get("cores", 0)
+
+    mem = data.get("memory", {})
+    m.memory_used = float(mem.get("used", 0.0))
+    m.memory_total = float(mem.get("total", 1.0))
+
+    swap = data.get("swap", {})
+    m.swap_used = float(swap.get("used", 0.0))
+    m.swap_total = float(swap.get("total", 1.0))
+
+    m.disks = data.get("disks", {})
+    m.processes = data.get("processes", [])
+    m.seq = data.get("seq", 0)
+    return m
+
+def _metrics_from_compact(arr: List) -> Metrics:
+    """Metrics straight from the metrics_codec positional schema (no JSON-shaped dict in between)."""
+    (_, seq, _ts, _host, cpu, cores, mem_total, mem_used, _mem_pct,
+     swap_total, swap_used, _swap_pct, disks, procs) = metrics_codec.compact_fields(arr)
+    return Metrics(
+        cpu_percent=cpu, cores=cores,
+        memory_used=mem_used, memory_total=mem_total,
+        swap_used=swap_used, swap_total=swap_total,
+        disks=metrics_codec.compact_disks(disks),
+        processes=metrics_codec.compact_processes(procs),
+        seq=seq,
+    )
+
+def _apply_metrics_patch(base: Metrics, data: Dict) -> Metrics:
+    """Applies a /metrics?since= delta to `base` and returns the updated copy."""
+    patch = data.get("patch", {})
+    m = replace(base, disks=dict(base.disks), processes=base.processes)
+    m.seq = data.get("seq", base.seq)
+
+    cpu = patch.get("cpu") or {}
+    if "usage_percent" in cpu: m.cpu_percent = float(cpu["usage_percent"])
+    if "cores" in cpu: m.cores = cpu["cores"]
+    mem = patch.get("memory") or {}
+    if "used" in mem: m.memory_used = float(mem["used"])
+    if "total" in mem: m.memory_total = float(mem["total"])
+    swap = patch.get("swap") or {}
+    if "used" in swap: m.swap_used = float(swap["used"])
+    if "total" in swap: m.swap_total = float(swap["total"])
+
+    for mount, d in (patch.get("disks") or {}).items():
+        if d is None:
+            m.disks.pop(mount, None)
+        else:
+            disk = dict(m.disks.get(mount, {}))
+            disk.update(d)
+            m.disks[mount] = {k: v for k, v in disk.items() if v is not None}
+
+    procs = data.get("processes")
+    if procs is not None:
+        by_pid = {p.get("pid"): p for p in base.processes}
+        for c in procs.get("changed", []):
+            p = dict(by_pid.get(c.get("pid"), {}))
+            p.update(c)
+            by_pid[c.get("pid")] = {k: v for k, v in p.items() if v is not None}
+        m.processes = [by_pid[pid] for pid in procs.get("order", []) if pid in by_pid]
+    return m
+
+def _ensure_commands(ip: str, hostname: str):
     global _last_known_host
     if hostname != _last_known_host:
         _update_commands_cache(ip)
         _last_known_host = hostname
 
+def _store_metrics(ip: str, data: Dict, state: MetricsBases) -> Optional[Metrics]:
+    """Turns a full document or a delta into Metrics and remembers it as the new base in `state`."""
+    if "base" not in data:
+        return state.put(ip, _metrics_from_payload(data))
+    with state.lock:
+        prev = state.bases.get(ip)
+        if prev is not None and data["base"] == prev.seq:
+            m = _apply_metrics_patch(prev, data)
+        else:
+            # delta względem nieznanej bazy - następne pobranie dostanie pełny dokument
+            state.bases.pop(ip, None)
+            return None
+        state.bases[ip] = m
+        return m
+
+def fetch_remote_metrics(ip: str, hostname: str) -> Optional[Metrics]:
+    _ensure_commands(ip, hostname)
+    return _fetch_metrics(ip, hostname, _metrics_state)
+
+def _fetch_metrics(ip: str, hostname: str, state: MetricsBases) -> Optional[Metrics]:
     try:
-        url = f"http://{ip}:{config.METRIX_SERVER_PORT}/metrics?host={hostname}"
-        r = requests.get(url, timeout=config.METRIX_REQUEST_TIMEOUT)
+        url = f"http://{ip}:{config.METRIX_SERVER_PORT}/metrics"
+        params = {"host": hostname}
+        since = state.seq(ip)
+        if since:
+            params["since"] = since
+        r = http_get(url, params=params, headers=_accept_headers(), timeout=config.METRIX_REQUEST_TIMEOUT)
         r.raise_for_status()
-        data = r.json()
-        
-        m = Metrics()
-        cpu = data.get("cpu", {})
-        m.cpu_percent = float(cpu.get("usage_percent", 0.0))
-        m.cores = cpu.get("cores", 0)
-        
-        mem = data.get("memory", {})
-        m.memory_used = float(mem.get("used", 0.0))
-        m.memory_total = float(mem.get("total", 1.0))
-        
-        swap = data.get("swap", {})
-        m.swap_used = float(swap.get("used", 0.0))
-        m.swap_total = float(swap.get("total", 1.0))
-        
-        m.disks = data.get("disks", {})
-        m.processes = data.get("processes", [])
-        
-        return m
+        if r.headers.get("Content-Type", "").startswith(metrics_codec.MIMETYPE):
+            # MessagePack to zawsze pełny dokument - od razu nowa baza dla delt JSON
+            return state.put(ip, _metrics_from_compact(metrics_codec.unpack(r.content)))
+        return _store_metrics(ip, r.json(), state)
     except Exception:
         return None
 
+class MetricsStream:
+    """
+    Consumes /metrics/stream of one agent on a background thread and calls
+    on_metrics(hostname, ip, metrics) for every pushed snapshot. None is passed
+    when the agent is unreachable; the stream then reconnects with backoff.
+    set_target() drops the current connection and follows the new host.
+    Agents without the stream endpoint are polled through /metrics.
+    """
+
+    def __init__(self, on_metrics: Callable[[str, str, Optional[Metrics]], None]):
+        self._on_metrics = on_metrics
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._target: Optional[Tuple[str, str]] = None
+        self._generation = 0
+        self._response = None
+        self._thread: Optional[threading.Thread] = None
+        self._bases = MetricsBases()
+
+    def set_target(self, hostname: str, ip: str):
+        with self._lock:
+            if self._target == (hostname, ip):
+                return
+            self._target = (hostname, ip)
+            self._generation += 1
+            resp, self._response = self._response, None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="metrics-stream", daemon=True)
+                self._thread.start()
+        if resp is not None:
+            try: resp.close()
+            except Exception: pass
+        self._wake.set()
+
+    def _current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def _run(self):
+        backoff = 1.0
+        while True:
+            with self._lock:
+                target, generation = self._target, self._generation
+            hostname, ip = target
+            received = False
+            try:
+                received = self._consume(hostname, ip, generation)
+            except Exception:
+                pass
+            if received:
+                backoff = 1.0
+            elif self._current(generation):
+                self._on_metrics(hostname, ip, None)
+                self._wake.wait(backoff)
+                backoff = min(backoff * 2, 15.0)
+            self._wake.clear()
+
+    def _consume(self, hostname: str, ip: str, generation: int) -> bool:
+        """Reads events until the connection drops; True if anything was received."""
+        _ensure_commands(ip, hostname)
+        url = f"http://{ip}:{config.METRIX_SERVER_PORT}/metrics/stream"
+        headers = {"Accept": "text/event-stream"}
+        last_id = self._bases.seq(ip)
+        if last_id:
+            headers["Last-Event-ID"] = str(last_id)
+        r = http_get(url, headers=headers, stream=True,
+                         timeout=(config.METRIX_REQUEST_TIMEOUT, config.METRICS_STREAM_READ_TIMEOUT))
+        with self._lock:
+            if not self._current(generation):
+                r.close()
+                return False
+            self._response = r
+
+        if r.status_code in (404, 503):
+            # 404: starszy agent bez /metrics/stream - zwykły polling;
+            # 503: limit strumieni agenta - polling do Retry-After, potem znów strumień
+            until = None
+            if r.status_code == 503:
+                try:
+                    until = time.monotonic() + max(1.0, float(r.headers.get("Retry-After", 30)))
+                except ValueError:
+                    until = time.monotonic() + 30.0
+            r.close()
+            while self._current(generation) and (until is None or time.monotonic() < until):
+                self._on_metrics(hostname, ip, _fetch_metrics(ip, hostname, self._bases))
+                if self._wake.wait(config.DASHBOARD_REFRESH_INTERVAL_SEC):
+                    break
+            return True
+        r.raise_for_status()
+        r.encoding = "utf-8"
+
+        received = False
+        data_lines: List[str] = []
+        for line in r.iter_lines(chunk_size=1024, decode_unicode=True):
+            if not self._current(generation):
+                break
+            if line:
+                if line.startswith("data:"):
+                    data_lines.append(line[5:].lstrip(" "))
+                continue
+            if not data_lines:
+                continue
+            m = _store_metrics(ip, json.loads("\n".join(data_lines)), self._bases)
+            data_lines = []
+            if m is None:
+                break  # zgubiona baza delty - połącz ponownie po pełny dokument
+            received = True
+            self._on_metrics(hostname, ip, m)
+        r.close()
+        return received
+
+# --------------------------------------------------
+# FLOTA: metryki wszystkich agentów w tle
+# --------------------------------------------------
+
+@dataclass
+class FleetHost:
+    hostname: str
+    ip: str
+    metrics: Optional[Metrics] = None
+    updated: float = 0.0      # time.time() ostatnich poprawnych metryk
+    failures: int = 0
+    next_due: float = 0.0     # time.monotonic()
+    polling: bool = False
+
+    @property
+    def online(self) -> bool:
+        return self.metrics is not None and self.failures == 0
+
+def _fleet_hosts_from_scanner(url: str) -> Dict[str, str]:
+    r = http_get(url, params={"status": "online"}, timeout=config.DASHBOARD_FLEET_SCANNER_TIMEOUT)
+    r.raise_for_status()
+    hosts = {}
+    for h in r.json().get("hosts", []):
+        ip, name = h.get("ip"), h.get("hostname")
+        if ip and name:
+            hosts[name] = ip
+    return hosts
+
+class FleetCollector:
+    """
+    Polls /metrics of every known agent on a small thread pool so any host can
+    be shown straight from cache. Hosts come from `static_hosts` (name -> ip)
+    and, if `scanner_url` is set, from the scanner's /api/hosts (refreshed every
+    `discovery_sec`). A host that fails is retried after interval * 2^failures,
+    capped at `max_backoff`. on_update(FleetHost) is called from the pool
+    threads after every poll.
+    """
+
+    def __init__(self, static_hosts: Dict[str, str], scanner_url: str = "",
+                 interval: float = 5.0, workers: int = 8, max_backoff: float = 60.0,
+                 discovery_sec: float = 60.0,
+                 on_update: Optional[Callable[[FleetHost], None]] = None):
+        self.static_hosts = dict(static_hosts)
+        self.scanner_url = scanner_url
+        self.interval = max(0.5, interval)
+        self.max_backoff = max(self.interval, max_backoff)
+        self.discovery_sec = discovery_sec
+        self._on_update = on_update
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._hosts: Dict[str, FleetHost] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fleet")
+        self._bases = MetricsBases()
+        self._thread: Optional[threading.Thread] = None
+        self._discovered = 0.0
+        self._set_hosts(self.static_hosts)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="fleet-collector", daemon=True)
+            self._thread.start()
+
+    def _set_hosts(self, names: Dict[str, str]):
+        with self._lock:
+            for name in list(self._hosts):
+                if name not in names:
+                    self._bases.discard(self._hosts.pop(name).ip)
+            for name, ip in names.items():
+                h = self._hosts.get(name)
+                if h is None:
+                    self._hosts[name] = FleetHost(name, ip)
+                elif h.ip != ip:
+                    self._bases.discard(h.ip)
+                    self._hosts[name] = FleetHost(name, ip)
+            # sesja keep-alive na każdego agenta floty, bez wypychania pozostałych
+            _sessions.reserve(len(self._hosts))
+
+    def _discover(self):
+        names = dict(self.static_hosts)
+        try:
+            names.update(_fleet_hosts_from_scanner(self.scanner_url))
+        except Exception:
+            return  # skaner niedostępny - zostaje poprzednia lista
+        with self._lock:
+            # host wskazany przez Barrier zostaje, nawet jeśli skaner go nie zna
+            for name, h in self._hosts.items():
+                if h.updated and name not in names:
+                    names[name] = h.ip
+        self._set_hosts(names)
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            if self.scanner_url and now - self._discovered >= self.discovery_sec:
+                self._discovered = now
+                self._discover()
+            with self._lock:
+                due = [h for h in self._hosts.values() if not h.polling and h.next_due <= now]
+                for h in due:
+                    h.polling = True
+                wait = min((h.next_due for h in self._hosts.values() if not h.polling),
+                           default=now + self.interval) - now
+            for h in due:
+                self._pool.submit(self._poll, h)
+            self._wake.wait(min(max(wait, 0.2), self.interval))
+            self._wake.clear()
+
+    def _poll(self, host: FleetHost):
+        m = _fetch_metrics(host.ip, host.hostname, self._bases)
+        with self._lock:
+            host.polling = False
+            if m is None:
+                host.failures += 1
+                delay = min(self.interval * (2 ** host.failures), self.max_backoff)
+            else:
+                host.metrics, host.updated, host.failures = m, time.time(), 0
+                delay = self.interval
+            host.next_due = time.monotonic() + delay
+        if self._on_update is not None:
+            self._on_update(host)
+        if m is None:
+            self._wake.set()
+
+    def observe(self, hostname: str, ip: str, metrics: Optional[Metrics]):
+        """
+        Metrics obtained elsewhere (stream / foreground fetch). Keeps the cache
+        warm and postpones the next poll of that host.
+        """
+        with self._lock:
+            h = self._hosts.get(hostname)
+            if h is None or h.ip != ip:
+                h = self._hosts[hostname] = FleetHost(hostname, ip)
+                _sessions.reserve(len(self._hosts))
+            if metrics is not None:
+                h.metrics, h.updated, h.failures = metrics, time.time(), 0
+                h.next_due = time.monotonic() + self.interval
+        if self._on_update is not None and metrics is not None:
+            self._on_update(h)
+
+    def get(self, hostname: str, ip: Optional[str] = None, max_age: Optional[float] = None) -> Optional[Metrics]:
+        """Cached metrics of a host or None (unknown / offline / older than max_age)."""
+        with self._lock:
+            h = self._hosts.get(hostname)
+            if h is None or h.metrics is None or (ip is not None and h.ip != ip):
+                return None
+            if max_age is not None and time.time() - h.updated > max_age:
+                return None
+            return h.metrics
+
+    def hosts(self) -> List[FleetHost]:
+        """Copies of all hosts, sorted by hostname."""
+        with self._lock:
+            return [replace(h) for _, h in sorted(self._hosts.items())]
+
 def send_command_to_server(ip: str, host: str, cmd: str) -> str:
     try:
         url = f"http://{ip}:{config.METRIX_SERVER_PORT}/command"
         payload = {"host": host, "cmd": cmd}
-        r = requests.post(url, json=payload, timeout=config.COMMANDS_REQUEST_TIMEOUT)
+        r = http_post(url, json=payload, timeout=config.COMMANDS_REQUEST_TIMEOUT)
         try:
             r.raise_for_status()
             resp = r.json() if r.headers.get("Content-Type", "").startswith("application/json") else {"status": "ok"}
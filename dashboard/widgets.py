@@ -1,11 +1,12 @@
+import json
 import math
-import requests
 import threading
 import time
 from typing import Dict, List
 from PyQt6 import QtCore, QtGui, QtWidgets
 
 import config
+from . import network_data as nd
 def human_size(bytesize: float) -> str:
     step = 1024.0
     units = ["B", "KB", "MB", "GB", "TB"]
@@ -16,21 +17,56 @@ def human_size(bytesize: float) -> str:
         i += 1
     return f"{v:.1f}{units[i]}"
 
+# --- SHARED ANIMATION TIMER ---
+
+class _SharedAnimator(QtCore.QObject):
+    """
+    One ~60 fps timer for all animated widgets. step() callbacks return True
+    while they still need frames; the timer stops when nothing is moving.
+    """
+    def __init__(self):
+        super().__init__()
+        self._steps = set()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(16)
+        self._timer.timeout.connect(self._tick)
+
+    def add(self, step):
+        self._steps.add(step)
+        if not self._timer.isActive(): self._timer.start()
+
+    def _tick(self):
+        for step in list(self._steps):
+            try: running = step()
+            except RuntimeError: running = False  # widget już usunięty po stronie Qt
+            if not running: self._steps.discard(step)
+        if not self._steps: self._timer.stop()
+
+_animator = None
+
+def animator() -> _SharedAnimator:
+    global _animator
+    if _animator is None: _animator = _SharedAnimator()
+    return _animator
+
 # --- STANDARD WIDGETS ---
 class LoadingSpinner(QtWidgets.QWidget):
-    def __init__(self, p=None): super().__init__(p); self.setFixedSize(40,40); self._a=0; self._t=QtCore.QTimer(self); self._t.timeout.connect(self._r); self._t.start(40); self._c=QtGui.QColor("#2A6CFF")
-    def _r(self): 
-        if self.isVisible(): self._a=(self._a+15)%360; self.update()
+    """Spins on the shared animator while visible (~375 deg/s, as with the old 40 ms / 15 deg timer)."""
+    def __init__(self, p=None): super().__init__(p); self.setFixedSize(40,40); self._a=0; self._c=QtGui.QColor("#2A6CFF")
+    def showEvent(self, e): super().showEvent(e); animator().add(self._r)
+    def _r(self):
+        if not self.isVisible(): return False
+        self._a=(self._a+6)%360; self.update(); return True
     def setColor(self, c): self._c=QtGui.QColor(c); self.update()
     def paintEvent(self, e): p=QtGui.QPainter(self); p.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing); r=self.rect().adjusted(4,4,-4,-4); pen=QtGui.QPen(self._c); pen.setWidth(4); pen.setCapStyle(QtCore.Qt.PenCapStyle.RoundCap); p.setPen(pen); p.drawArc(r,-self._a*16, 270*16)
 
 class CircularGauge(QtWidgets.QWidget):
-    def __init__(self, p=None): super().__init__(p); self._v=0.0; self._t=0.0; self._tm=QtCore.QTimer(self); self._tm.timeout.connect(self._a); self.setMinimumSize(200,200)
-    def setValue(self, v): self._t=max(0,min(100,float(v))); self._tm.start(16)
-    def _a(self): 
-        if abs(self._v-self._t)<0.1: self._v=self._t; self._tm.stop()
-        else: self._v+=(self._t-self._v)*0.1
-        self.update()
+    def __init__(self, p=None): super().__init__(p); self._v=0.0; self._t=0.0; self.setMinimumSize(200,200)
+    def setValue(self, v): self._t=max(0,min(100,float(v))); animator().add(self._a)
+    def _a(self):
+        done=abs(self._v-self._t)<0.1
+        self._v=self._t if done else self._v+(self._t-self._v)*0.1
+        self.update(); return not done
     def paintEvent(self, e):
         p=QtGui.QPainter(self); p.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing); r=self.rect(); s=min(r.width(),r.height()); rad=s*0.38; rect=QtCore.QRectF(r.center().x()-rad, r.center().y()-rad, rad*2, rad*2)
         p.setPen(QtGui.QPen(QtGui.QColor("#1A1C1E"), rad*0.18)); p.drawEllipse(rect)
@@ -38,12 +74,12 @@ class CircularGauge(QtWidgets.QWidget):
         p.setPen(QtGui.QColor("#E6E8EB")); f=p.font(); f.setPointSize(28); f.setBold(True); p.setFont(f); p.drawText(rect, QtCore.Qt.AlignmentFlag.AlignCenter, f"{int(self._v)}%")
 
 class MemoryBar(QtWidgets.QWidget):
-    def __init__(self, p=None): super().__init__(p); self._v=0; self._t=0; self._tm=QtCore.QTimer(self); self._tm.timeout.connect(self._a)
-    def setPercent(self, v): self._t=max(0,min(100,float(v))); self._tm.start(20)
+    def __init__(self, p=None): super().__init__(p); self._v=0; self._t=0
+    def setPercent(self, v): self._t=max(0,min(100,float(v))); animator().add(self._a)
     def _a(self):
-        if abs(self._v-self._t)<0.1: self._v=self._t; self._tm.stop()
-        else: self._v+=(self._t-self._v)*0.1
-        self.update()
+        done=abs(self._v-self._t)<0.1
+        self._v=self._t if done else self._v+(self._t-self._v)*0.1
+        self.update(); return not done
     def paintEvent(self, e):
         r=self.rect(); p=QtGui.QPainter(self); p.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
         bg=QtCore.QRectF(0, r.height()*0.25, r.width(), r.height()*0.5)
@@ -69,6 +105,164 @@ class DiskList(QtWidgets.QWidget):
             if fw>0: p.drawRoundedRect(QtCore.QRectF(br.x(),br.y(),fw,br.height()),4,4)
             y+=60
 
+# --- FLEET GRID ---
+
+FLEET_TILE_W = 220
+FLEET_TILE_H = 118
+
+def _disk_percent(disks: Dict[str, Dict[str, float]]) -> float:
+    # najbardziej zapełniona partycja
+    pct = 0.0
+    for d in disks.values():
+        t = d.get("total", 0)
+        if t: pct = max(pct, 100.0 * d.get("used", 0) / t)
+    return pct
+
+class _FleetTile:
+    __slots__ = ("hostname", "ip", "online", "target", "shown")
+
+    def __init__(self, hostname: str, ip: str):
+        self.hostname = hostname; self.ip = ip; self.online = False
+        self.target = [0.0, 0.0, 0.0]  # cpu, mem, disk %
+        self.shown = [0.0, 0.0, 0.0]
+
+class FleetModel(QtCore.QAbstractTableModel):
+    """
+    Hosts laid out row-major in a grid of `columns` cells; every cell returns
+    its _FleetTile under Qt.UserRole. Displayed values ease towards the latest
+    metrics on the shared animator; only rows reported by `visible_rows` are
+    animated, the rest jump straight to the target.
+    """
+    TileRole = QtCore.Qt.ItemDataRole.UserRole
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tiles: List[_FleetTile] = []
+        self._columns = 1
+        self.visible_rows = lambda: (0, self.rowCount() - 1)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else math.ceil(len(self._tiles) / self._columns)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._columns
+
+    def _tile(self, index) -> "_FleetTile | None":
+        i = index.row() * self._columns + index.column()
+        return self._tiles[i] if index.isValid() and i < len(self._tiles) else None
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        tile = self._tile(index)
+        if tile is None: return None
+        if role == self.TileRole: return tile
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole: return f"{tile.hostname} ({tile.ip})"
+        return None
+
+    def flags(self, index):
+        if self._tile(index) is None: return QtCore.Qt.ItemFlag.NoItemFlags
+        return QtCore.Qt.ItemFlag.ItemIsEnabled | QtCore.Qt.ItemFlag.ItemIsSelectable
+
+    def setColumns(self, columns: int):
+        columns = max(1, columns)
+        if columns == self._columns: return
+        self.beginResetModel(); self._columns = columns; self.endResetModel()
+
+    def _cell(self, i: int):
+        return self.index(i // self._columns, i % self._columns)
+
+    def setHosts(self, hosts: List["nd.FleetHost"]):
+        if [(h.hostname, h.ip) for h in hosts] != [(t.hostname, t.ip) for t in self._tiles]:
+            old = {t.hostname: t for t in self._tiles}
+            self.beginResetModel()
+            self._tiles = [old.get(h.hostname) if h.hostname in old and old[h.hostname].ip == h.ip
+                           else _FleetTile(h.hostname, h.ip) for h in hosts]
+            self.endResetModel()
+        for i, (h, tile) in enumerate(zip(hosts, self._tiles)):
+            m = h.metrics
+            target = [m.cpu_percent, m.memory_percent(), _disk_percent(m.disks)] if m else [0.0, 0.0, 0.0]
+            if tile.online != h.online:
+                tile.online = h.online
+                idx = self._cell(i); self.dataChanged.emit(idx, idx)
+            tile.target = [max(0.0, min(100.0, v)) for v in target]
+        animator().add(self._step)
+
+    def _step(self) -> bool:
+        first, last = self.visible_rows()
+        moving = False
+        for i, tile in enumerate(self._tiles):
+            if tile.shown == tile.target: continue
+            if first <= i // self._columns <= last:
+                tile.shown = [t if abs(t - v) < 0.1 else v + (t - v) * 0.15 for v, t in zip(tile.shown, tile.target)]
+                moving = moving or tile.shown != tile.target
+            else:
+                tile.shown = list(tile.target)
+            idx = self._cell(i); self.dataChanged.emit(idx, idx)
+        return moving
+
+class FleetTileDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints one host tile; the view only asks for cells inside the viewport."""
+    BARS = (("CPU", "#2A6CFF"), ("MEM", "#FFD300"), ("DISK", "#2A6CFF"))
+
+    def sizeHint(self, option, index): return QtCore.QSize(FLEET_TILE_W, FLEET_TILE_H)
+
+    def paint(self, p, option, index):
+        tile = index.data(FleetModel.TileRole)
+        if tile is None: return
+        p.save(); p.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
+        r = QtCore.QRectF(option.rect).adjusted(4, 4, -4, -4)
+        selected = bool(option.state & QtWidgets.QStyle.StateFlag.State_Selected)
+        p.setPen(QtGui.QPen(QtGui.QColor("#2A6CFF"), 2) if selected else QtCore.Qt.PenStyle.NoPen)
+        p.setBrush(QtGui.QColor("#131517")); p.drawRoundedRect(r, 10, 10)
+
+        f = p.font(); f.setPointSize(11); f.setBold(True); p.setFont(f)
+        p.setPen(QtGui.QColor("#E6E8EB" if tile.online else "#9FA3A7"))
+        head = QtCore.QRectF(r.x() + 10, r.y() + 6, r.width() - 34, 20)
+        p.drawText(head, QtCore.Qt.AlignmentFlag.AlignLeft | QtCore.Qt.AlignmentFlag.AlignVCenter,
+                   p.fontMetrics().elidedText(tile.hostname, QtCore.Qt.TextElideMode.ElideRight, int(head.width())))
+        p.setPen(QtCore.Qt.PenStyle.NoPen); p.setBrush(QtGui.QColor("#3DDC84" if tile.online else "#FF5555"))
+        p.drawEllipse(QtCore.QPointF(r.right() - 14, r.y() + 16), 5, 5)
+
+        f.setPointSize(9); f.setBold(False); p.setFont(f)
+        y = r.y() + 34
+        for (label, color), v in zip(self.BARS, tile.shown):
+            p.setPen(QtGui.QColor("#9FA3A7"))
+            p.drawText(QtCore.QRectF(r.x() + 10, y, 36, 14), QtCore.Qt.AlignmentFlag.AlignLeft | QtCore.Qt.AlignmentFlag.AlignVCenter, label)
+            p.drawText(QtCore.QRectF(r.right() - 46, y, 36, 14), QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter, f"{int(v)}%")
+            bar = QtCore.QRectF(r.x() + 48, y + 3, r.width() - 100, 8)
+            p.setPen(QtCore.Qt.PenStyle.NoPen); p.setBrush(QtGui.QColor("#2B2F33")); p.drawRoundedRect(bar, 4, 4)
+            if tile.online and v > 0:
+                p.setBrush(QtGui.QColor(color)); p.drawRoundedRect(QtCore.QRectF(bar.x(), bar.y(), bar.width() * v / 100, bar.height()), 4, 4)
+            y += 24
+        p.restore()
+
+class FleetGrid(QtWidgets.QTableView):
+    """Tile grid of all hosts known to the FleetCollector; columns follow the width."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.fleet_model = FleetModel(self)
+        self.fleet_model.visible_rows = self._visible_rows
+        self.setModel(self.fleet_model)
+        self.setItemDelegate(FleetTileDelegate(self))
+        self.horizontalHeader().setVisible(False); self.verticalHeader().setVisible(False)
+        self.horizontalHeader().setDefaultSectionSize(FLEET_TILE_W)
+        self.verticalHeader().setDefaultSectionSize(FLEET_TILE_H)
+        self.setShowGrid(False)
+        self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.SingleSelection)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setStyleSheet("QTableView { background: transparent; border: none; } QTableView::item:selected { background: transparent; }")
+
+    def setHosts(self, hosts: List["nd.FleetHost"]): self.fleet_model.setHosts(hosts)
+
+    def _visible_rows(self):
+        first = self.rowAt(0); last = self.rowAt(self.viewport().height() - 1)
+        return (max(first, 0), last if last >= 0 else self.fleet_model.rowCount() - 1)
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        self.fleet_model.setColumns(self.viewport().width() // FLEET_TILE_W)
+
 # --- NEW: LIVE SCREEN VIEW ---
 
 class LiveScreenView(QtWidgets.QLabel):
@@ -81,6 +275,10 @@ class LiveScreenView(QtWidgets.QLabel):
         self.setMinimumSize(320, 200)
         
         self._ip = None
+        # Ostatnia klatka (QImage - składana w wątku pobierającym) i jej numer
+        self._frame: "QtGui.QImage | None" = None
+        self._frame_id = None
+        self._busy = threading.Lock()
         self._timer = QtCore.QTimer(self)
         self._timer.setInterval(config.LIVE_SCREEN_REFRESH_MS)
         self._timer.timeout.connect(self._trigger_update)
@@ -88,6 +286,7 @@ class LiveScreenView(QtWidgets.QLabel):
     def setIP(self, ip: str):
         if self._ip != ip:
             self._ip = ip
+            self._frame = None; self._frame_id = None
             self.setText("Loading Screen...")
             self._trigger_update()
             if not self._timer.isActive():
@@ -95,25 +294,62 @@ class LiveScreenView(QtWidgets.QLabel):
 
     def _trigger_update(self):
         if not self._ip: return
-        threading.Thread(target=self._fetch_screen, daemon=True).start()
+        if not self._busy.acquire(blocking=False): return  # poprzednie pobranie jeszcze trwa
+        threading.Thread(target=self._fetch_screen, args=(self._ip,), daemon=True).start()
 
-    def _fetch_screen(self):
+    def _fetch_screen(self, ip: str):
         try:
-            # Endpoint /screenshot/full (zwraca zrzut całego ekranu)
-            url = f"http://{self._ip}:{config.METRIX_SERVER_PORT}/screenshot/full"
-            r = requests.get(url, timeout=config.SCREENSHOT_TIMEOUT)
-            if r.status_code == 200:
-                pixmap = QtGui.QPixmap()
-                pixmap.loadFromData(r.content)
-                QtCore.QMetaObject.invokeMethod(self, "update_pixmap", QtCore.Qt.ConnectionType.QueuedConnection, QtCore.Q_ARG(QtGui.QPixmap, pixmap))
-            else:
+            # Endpoint /screenshot/full?tiles=1 - tylko kafelki zmienione od naszej klatki
+            url = f"http://{ip}:{config.METRIX_SERVER_PORT}/screenshot/full"
+            params = {"tiles": 1}
+            if self._frame is not None and self._frame_id is not None:
+                params["since"] = self._frame_id
+            r = nd.http_get(url, params=params, timeout=config.SCREENSHOT_TIMEOUT)
+            if ip != self._ip:
+                return
+            if r.status_code == 304:
+                return
+            if r.status_code != 200:
                 QtCore.QMetaObject.invokeMethod(self, "show_error", QtCore.Qt.ConnectionType.QueuedConnection)
+                return
+            frame = self._compose(r)
+            if frame is None:
+                return
+            QtCore.QMetaObject.invokeMethod(self, "update_frame", QtCore.Qt.ConnectionType.QueuedConnection, QtCore.Q_ARG(QtGui.QImage, frame.copy()))
         except Exception:
             QtCore.QMetaObject.invokeMethod(self, "show_error", QtCore.Qt.ConnectionType.QueuedConnection)
+        finally:
+            self._busy.release()
+
+    def _compose(self, r) -> "QtGui.QImage | None":
+        frame_id = r.headers.get("X-Screen-Frame")
+        if not r.headers.get("Content-Type", "").startswith("application/x-screen-tiles"):
+            # pełna klatka (także od starszego agenta bez kafelków)
+            image = QtGui.QImage.fromData(r.content)
+            if image.isNull(): return None
+            self._frame = image.convertToFormat(QtGui.QImage.Format.Format_RGB32)
+            self._frame_id = int(frame_id) if frame_id else None
+            return self._frame
+
+        body = r.content
+        nl = body.index(b"\n")
+        header = json.loads(body[:nl])
+        if self._frame is None or header.get("base") != self._frame_id:
+            self._frame_id = None  # nie ta baza - następne pobranie dostanie pełną klatkę
+            return None
+        painter = QtGui.QPainter(self._frame)
+        offset = nl + 1
+        for x, y, length in header["tiles"]:
+            tile = QtGui.QImage.fromData(body[offset:offset + length])
+            offset += length
+            painter.drawImage(x, y, tile)
+        painter.end()
+        self._frame_id = header["frame"]
+        return self._frame
 
-    @QtCore.pyqtSlot(QtGui.QPixmap)
-    def update_pixmap(self, pixmap):
-        self.setPixmap(pixmap)
+    @QtCore.pyqtSlot(QtGui.QImage)
+    def update_frame(self, image):
+        self.setPixmap(QtGui.QPixmap.fromImage(image))
         self.setStyleSheet("background-color: #000; border-radius: 6px; border: 2px solid #2A6CFF;")
 
     @QtCore.pyqtSlot()
@@ -124,23 +360,102 @@ class LiveScreenView(QtWidgets.QLabel):
 
 # --- NEW: PROCESS TABLE ---
 
-class ProcessTable(QtWidgets.QTableWidget):
+class ProcessModel(QtCore.QAbstractTableModel):
+    """
+    Process rows keyed by PID. update() removes / inserts only the rows that
+    left or joined the list and emits dataChanged for the cells whose value
+    changed, so selection and scroll position survive refreshes. Rows keep
+    their arrival order; sorting is done by a proxy on SortRole.
+    """
+    COLUMNS = (("Name", "name"), ("PID", "pid"), ("CPU", "cpu"), ("Mem", "mem"))
+    SortRole = QtCore.Qt.ItemDataRole.UserRole
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setColumnCount(3)
-        self.setHorizontalHeaderLabels(["Name", "PID", "Mem"])
-        
+        self._rows: List[Dict] = []
+        self._row_of: Dict[int, int] = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if orientation == QtCore.Qt.Orientation.Horizontal and role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        key = self.COLUMNS[index.column()][1]
+        v = self._rows[index.row()].get(key)
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            if key == "mem": return human_size(v or 0)
+            if key == "cpu": return f"{v or 0:.1f}%"
+            return str(v if v is not None else "?")
+        if role == self.SortRole:
+            return str(v or "").lower() if key == "name" else (v or 0)
+        if role == QtCore.Qt.ItemDataRole.TextAlignmentRole:
+            if key == "name": return None
+            if key == "pid": return QtCore.Qt.AlignmentFlag.AlignCenter
+            return QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter
+        return None
+
+    def update(self, processes: List[Dict]):
+        incoming = {p.get("pid"): p for p in processes}
+
+        # usunięcia - od końca, spójnymi blokami
+        gone = sorted((r for pid, r in self._row_of.items() if pid not in incoming), reverse=True)
+        i = 0
+        while i < len(gone):
+            last = first = gone[i]
+            while i + 1 < len(gone) and gone[i + 1] == first - 1:
+                i += 1; first = gone[i]
+            self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+            del self._rows[first:last + 1]
+            self.endRemoveRows()
+            i += 1
+        if gone: self._row_of = {p.get("pid"): r for r, p in enumerate(self._rows)}
+
+        # zmiany - tylko komórki z inną wartością
+        for pid, r in self._row_of.items():
+            new, old = incoming[pid], self._rows[r]
+            cols = [c for c, (_, key) in enumerate(self.COLUMNS) if new.get(key) != old.get(key)]
+            self._rows[r] = new
+            if cols: self.dataChanged.emit(self.index(r, min(cols)), self.index(r, max(cols)))
+
+        # nowe procesy na koniec
+        added = [p for pid, p in incoming.items() if pid not in self._row_of]
+        if added:
+            n = len(self._rows)
+            self.beginInsertRows(QtCore.QModelIndex(), n, n + len(added) - 1)
+            for r, p in enumerate(added, n):
+                self._rows.append(p); self._row_of[p.get("pid")] = r
+            self.endInsertRows()
+
+class ProcessTable(QtWidgets.QTableView):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.process_model = ProcessModel(self)
+        self._proxy = QtCore.QSortFilterProxyModel(self)
+        self._proxy.setSourceModel(self.process_model)
+        self._proxy.setSortRole(ProcessModel.SortRole)
+        self._proxy.setDynamicSortFilter(True)
+        self.setModel(self._proxy)
+        self.setSortingEnabled(True)
+        self.sortByColumn(3, QtCore.Qt.SortOrder.DescendingOrder)
+
         # Stylizacja
         self.verticalHeader().setVisible(False)
         self.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
-        self.horizontalHeader().setSectionResizeMode(1, QtWidgets.QHeaderView.ResizeMode.Fixed)
-        self.horizontalHeader().setSectionResizeMode(2, QtWidgets.QHeaderView.ResizeMode.Fixed)
-        self.setColumnWidth(1, 60)
-        self.setColumnWidth(2, 80)
-        
+        for col, width in ((1, 60), (2, 60), (3, 80)):
+            self.horizontalHeader().setSectionResizeMode(col, QtWidgets.QHeaderView.ResizeMode.Fixed)
+            self.setColumnWidth(col, width)
+
         self.setAlternatingRowColors(True)
         self.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: #131517;
                 border: none;
                 gridline-color: #2B2F33;
@@ -153,10 +468,10 @@ class ProcessTable(QtWidgets.QTableWidget):
                 padding: 4px;
                 font-weight: bold;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 2px;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #2A6CFF;
                 color: white;
             }
@@ -165,21 +480,4 @@ class ProcessTable(QtWidgets.QTableWidget):
         self.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
 
     def update_data(self, processes: List[Dict]):
-        # Zapamiętujemy scroll
-        scroll_pos = self.verticalScrollBar().value()
-        
-        self.setRowCount(len(processes))
-        for row, p in enumerate(processes):
-            name_item = QtWidgets.QTableWidgetItem(str(p.get("name", "?")))
-            pid_item = QtWidgets.QTableWidgetItem(str(p.get("pid", "?")))
-            mem_item = QtWidgets.QTableWidgetItem(human_size(p.get("mem", 0)))
-            
-            # Wyrównanie
-            pid_item.setTextAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
-            mem_item.setTextAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
-            
-            self.setItem(row, 0, name_item)
-            self.setItem(row, 1, pid_item)
-            self.setItem(row, 2, mem_item)
-            
-        self.verticalScrollBar().setValue(scroll_pos)
+        self.process_model.update(processes)
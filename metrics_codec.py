@@ -0,0 +1,125 @@
+"""
+Compact binary (MessagePack) encoding of agent responses.
+
+Metrics documents use a fixed positional schema instead of maps, so field
+names are not repeated for every process and partition:
+
+    [version, seq, timestamp, host,
+     cpu_usage, cores,
+     mem_total, mem_used, mem_percent,
+     swap_total, swap_used, swap_percent,
+     [[mount, total, used, free, percent], ...],
+     [[pid, name, mem, cpu, io, fds], ...]]      io / fds: nil when not collected
+
+Everything else (command list, clipboard) is packed as plain maps.
+Shared by metrix_server.py and the dashboard; msgpack is optional on both
+sides, without it everybody keeps talking JSON.
+
+    python metrics_codec.py     # round-trip check of the schema
+"""
+from __future__ import annotations
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MIMETYPE = "application/x-msgpack"
+SCHEMA_VERSION = 1
+
+
+def available() -> bool:
+    return msgpack is not None
+
+
+def pack(obj) -> bytes:
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def unpack(data: bytes):
+    return msgpack.unpackb(data, raw=False)
+
+
+def metrics_to_compact(doc: dict) -> list:
+    cpu = doc.get("cpu", {})
+    mem = doc.get("memory", {})
+    swap = doc.get("swap", {})
+    return [
+        SCHEMA_VERSION, doc.get("seq", 0), doc.get("timestamp", 0), doc.get("host", ""),
+        float(cpu.get("usage_percent", 0.0)), cpu.get("cores", 0),
+        mem.get("total", 0), mem.get("used", 0), float(mem.get("percent", 0.0)),
+        swap.get("total", 0), swap.get("used", 0), float(swap.get("percent", 0.0)),
+        [[mount, d.get("total", 0), d.get("used", 0), d.get("free", 0), float(d.get("percent", 0.0))]
+         for mount, d in doc.get("disks", {}).items()],
+        [[p.get("pid"), p.get("name"), p.get("mem", 0), float(p.get("cpu", 0.0)), p.get("io"), p.get("fds")]
+         for p in doc.get("processes", [])],
+    ]
+
+
+def compact_fields(arr: list) -> tuple:
+    """The positional fields of a compact document, after checking its schema version."""
+    if arr[0] != SCHEMA_VERSION:
+        raise ValueError(f"unsupported metrics schema {arr[0]}")
+    return tuple(arr)
+
+
+def compact_disks(disks: list) -> dict:
+    return {m: {"total": t, "used": u, "free": f, "percent": pc} for m, t, u, f, pc in disks}
+
+
+def compact_processes(procs: list) -> list:
+    processes = []
+    for pid, name, mem, pcpu, io, fds in procs:
+        p = {"pid": pid, "name": name, "mem": mem, "cpu": pcpu}
+        if io is not None: p["io"] = io
+        if fds is not None: p["fds"] = fds
+        processes.append(p)
+    return processes
+
+
+def compact_to_metrics(arr: list) -> dict:
+    """Back to the JSON document layout (for generic consumers)."""
+    (_, seq, timestamp, host, cpu, cores, mem_total, mem_used, mem_percent,
+     swap_total, swap_used, swap_percent, disks, procs) = compact_fields(arr)
+    return {
+        "seq": seq,
+        "timestamp": timestamp,
+        "host": host,
+        "cpu": {"usage_percent": cpu, "cores": cores},
+        "memory": {"total": mem_total, "used": mem_used, "percent": mem_percent},
+        "swap": {"total": swap_total, "used": swap_used, "percent": swap_percent},
+        "disks": compact_disks(disks),
+        "processes": compact_processes(procs),
+    }
+
+
+_SAMPLE = {
+    "seq": 1700000000001, "timestamp": 1700000000, "host": "sample",
+    "cpu": {"usage_percent": 12.5, "cores": 8},
+    "memory": {"total": 16 * 1024 ** 3, "used": 6 * 1024 ** 3, "percent": 37.5},
+    "swap": {"total": 2 * 1024 ** 3, "used": 0, "percent": 0.0},
+    "disks": {"/": {"total": 512 * 1024 ** 3, "used": 100 * 1024 ** 3, "free": 412 * 1024 ** 3, "percent": 19.5}},
+    "processes": [
+        {"pid": 1, "name": "init", "mem": 4096, "cpu": 0.0},
+        {"pid": 42, "name": "server.exe", "mem": 10 ** 9, "cpu": 55.5, "io": 1234.5, "fds": 17},
+    ],
+}
+
+
+def check_round_trip(doc: dict | None = None):
+    """metrics_to_compact -> pack -> unpack -> compact_to_metrics must give back `doc` (AssertionError otherwise)."""
+    doc = _SAMPLE if doc is None else doc
+    back = compact_to_metrics(unpack(pack(metrics_to_compact(doc))))
+    for key in ("seq", "timestamp", "host", "cpu", "memory", "swap", "disks", "processes"):
+        want = doc.get(key)
+        if key in ("cpu", "memory", "swap"):
+            want = {k: v for k, v in (want or {}).items() if k in back[key]}
+        assert back[key] == want, f"{key}: {back[key]!r} != {want!r}"
+    return back
+
+
+if __name__ == "__main__":
+    if not available():
+        raise SystemExit("msgpack not installed (pip install msgpack)")
+    check_round_trip()
+    print("metrics_codec: round trip ok")
@@ -7,10 +7,17 @@ import platform
 import subprocess
 import time
 import io
+import json
+import heapq
 import logging
+import math
+import zlib
 import requests
+from array import array
+from collections import deque
 
 import config
+import metrics_codec
 
 # Biblioteki Flask i systemowe
 from flask import Flask, jsonify, request, send_file
@@ -136,6 +143,134 @@ def generate_fallback_image(pid, proc_name, reason="Info"):
     img_io.seek(0)
     return img_io
 
+# ==========================================
+# TABELA PROCESÓW (top-N)
+# ==========================================
+
+PROCESS_RANKINGS = ("mem", "cpu", "io", "fds")
+
+
+class _ProcEntry:
+    __slots__ = ("pid", "name", "mem", "cpu", "io_total", "io", "fds")
+
+    def __init__(self, pid, name):
+        self.pid = pid
+        self.name = name
+        self.mem = 0
+        self.cpu = 0.0
+        self.io_total = None
+        self.io = None
+        self.fds = None
+
+    def as_dict(self):
+        d = {"pid": self.pid, "name": self.name, "mem": self.mem, "cpu": self.cpu}
+        if self.io is not None: d["io"] = self.io
+        if self.fds is not None: d["fds"] = self.fds
+        return d
+
+
+class ProcessTracker:
+    """
+    Persistent process table keyed by (pid, create_time).
+
+    psutil.process_iter() hands back the same Process object for a live pid, so
+    names are read once per process and cpu_percent() measures between samples.
+    Each refresh only reads the counters of the rankings somebody asked for in
+    the last `ranking_idle` seconds ("mem" and "cpu" are always kept) and picks
+    the top-N per ranking with a heap instead of sorting the whole table.
+    A freshly demanded "io" ranking needs two refreshes before it has rates;
+    ready() tells whether a ranking holds real values yet.
+    """
+
+    # ile odświeżeń z włączonym rankingiem, zanim ma on sensowne wartości
+    WARMUP = {"io": 2, "fds": 1}
+
+    def __init__(self, top_n, ranking_idle):
+        self.top_n = max(1, int(top_n))
+        self.ranking_idle = ranking_idle
+        self._table = {}
+        self._lock = threading.Lock()
+        self._demand = {}
+        self._collected = {}
+        self._last_refresh = None
+
+    def demand(self, ranking):
+        """Marks a ranking as wanted; returns False if it was not collected yet."""
+        with self._lock:
+            now = time.monotonic()
+            active = ranking in self._active(now)
+            self._demand[ranking] = now
+        return active
+
+    def ready(self, ranking):
+        with self._lock:
+            return self._collected.get(ranking, 0) >= self.WARMUP.get(ranking, 0)
+
+    def _active(self, now):
+        active = {"mem", "cpu"}
+        active.update(r for r, t in self._demand.items() if now - t < self.ranking_idle)
+        return active
+
+    def active_rankings(self):
+        with self._lock:
+            return self._active(time.monotonic())
+
+    def refresh(self):
+        active = self.active_rankings()
+        want_io = "io" in active
+        want_fds = "fds" in active
+        now = time.monotonic()
+        dt = now - self._last_refresh if self._last_refresh else None
+        self._last_refresh = now
+
+        table = self._table
+        seen = set()
+        for proc in psutil.process_iter():
+            try:
+                key = (proc.pid, proc.create_time())
+                entry = table.get(key)
+                if entry is None:
+                    entry = table[key] = _ProcEntry(proc.pid, proc.name())
+                with proc.oneshot():
+                    entry.mem = proc.memory_info().rss
+                    entry.cpu = proc.cpu_percent(interval=None)
+                    if want_io:
+                        try:
+                            c = proc.io_counters()
+                            total = c.read_bytes + c.write_bytes
+                            # bez poprzedniego licznika nie ma tempa - proces poza rankingiem
+                            entry.io = int((total - entry.io_total) / dt) if entry.io_total is not None and dt else None
+                            entry.io_total = total
+                        except (psutil.AccessDenied, AttributeError):
+                            pass
+                    if want_fds:
+                        try:
+                            entry.fds = proc.num_handles() if is_windows else proc.num_fds()
+                        except psutil.AccessDenied:
+                            pass
+                seen.add(key)
+            except Exception:
+                # NoSuchProcess / AccessDenied / ZombieProcess - pomijamy proces
+                pass
+
+        for key in [k for k in table if k not in seen]:
+            del table[key]
+        if not want_io:
+            for entry in table.values(): entry.io_total = entry.io = None
+        if not want_fds:
+            for entry in table.values(): entry.fds = None
+        with self._lock:
+            for ranking in PROCESS_RANKINGS:
+                self._collected[ranking] = self._collected.get(ranking, 0) + 1 if ranking in active else 0
+        return active
+
+    def top(self, ranking):
+        entries = [e for e in self._table.values() if getattr(e, ranking) is not None]
+        return [e.as_dict() for e in heapq.nlargest(self.top_n, entries, key=lambda e: getattr(e, ranking))]
+
+
+process_tracker = ProcessTracker(config.METRICS_PROCESS_TOP_N, config.METRICS_RANKING_IDLE_SEC)
+
 def get_metrics():
     cpu_percent = psutil.cpu_percent(interval=None)
     cpu_count = psutil.cpu_count(logical=True)
@@ -148,16 +283,12 @@ def get_metrics():
             u = psutil.disk_usage(part.mountpoint)
             disks[part.mountpoint] = {"total": u.total, "used": u.used, "free": u.free, "percent": u.percent}
     except: pass
-    
-    procs = []
+
+    rankings = {}
     try:
-        for p in psutil.process_iter(['pid', 'name', 'memory_info']):
-            try:
-                mem_usage = p.info['memory_info'].rss
-                procs.append({"pid": p.info['pid'], "name": p.info['name'], "mem": mem_usage})
-            except: pass
+        for ranking in process_tracker.refresh():
+            rankings[ranking] = process_tracker.top(ranking)
     except: pass
-    procs_sorted = sorted(procs, key=lambda x: x['mem'], reverse=True)[:30]
 
     return {
         "timestamp": int(time.time()),
@@ -166,15 +297,903 @@ def get_metrics():
         "memory": {"total": mem.total, "used": mem.used, "percent": mem.percent},
         "swap": {"total": swp.total, "used": swp.used, "percent": swp.percent},
         "disks": disks,
-        "processes": procs_sorted
+        "processes": rankings.pop("mem", []),
+        "rankings": rankings,
     }
 
+# ==========================================
+# SAMPLER METRYK (wątek w tle)
+# ==========================================
+
+def _merge_diff(old, new):
+    """RFC 7386 merge patch turning `old` into `new` (None marks a removed key)."""
+    patch = {}
+    for k, v in new.items():
+        ov = old.get(k)
+        if k in old and ov == v:
+            continue
+        if isinstance(v, dict) and isinstance(ov, dict):
+            patch[k] = _merge_diff(ov, v)
+        else:
+            patch[k] = v
+    for k in old:
+        if k not in new:
+            patch[k] = None
+    return patch
+
+
+def _process_diff(old, new):
+    """New order of PIDs plus only the process rows (or fields) that changed."""
+    prev = {p["pid"]: p for p in old}
+    changed = []
+    for p in new:
+        op = prev.get(p["pid"])
+        if op is None:
+            changed.append(p)
+            continue
+        d = {k: v for k, v in p.items() if op.get(k) != v}
+        d.update((k, None) for k in op if k not in p)
+        if d:
+            d["pid"] = p["pid"]
+            changed.append(d)
+    return {"order": [p["pid"] for p in new], "changed": changed}
+
+
+def metrics_delta(base, doc):
+    """
+    Patch from metrics document `base` to `doc`:
+    {"seq", "base", "patch": <merge patch without processes>, "processes": {"order", "changed"}}
+    """
+    strip = lambda d: {k: v for k, v in d.items() if k != "processes"}
+    return {
+        "seq": doc["seq"],
+        "base": base["seq"],
+        "patch": _merge_diff(strip(base), strip(doc)),
+        "processes": _process_diff(base.get("processes", []), doc.get("processes", [])),
+    }
+
+
+class MetricsSnapshot:
+    """One sampled metrics document together with its serialized form."""
+    __slots__ = ("seq", "data", "body", "rankings", "_encoded")
+
+    def __init__(self, seq, data, body, rankings):
+        self.seq = seq
+        self.data = data
+        self.body = body
+        self.rankings = rankings
+        self._encoded = {}
+
+    def document(self, sort="mem", top=None):
+        """The metrics document with `processes` taken from the given ranking."""
+        if sort == "mem" and top is None:
+            return self.data
+        procs = self.data["processes"] if sort == "mem" else self.rankings.get(sort, [])
+        return dict(self.data, processes=procs[:top] if top else procs)
+
+    def _cached(self, key, build):
+        # zapamiętujemy tylko kształty kanoniczne (domyślne top, delta od
+        # poprzedniego snapshotu) - klient iterujący ?top= / ?since= nie
+        # powiększa cache bez końca
+        if key is None:
+            return build()
+        body = self._encoded.get(key)
+        if body is None:
+            body = self._encoded[key] = build()
+        return body
+
+    def encode_compact(self, sort="mem", top=None):
+        """MessagePack body in the fixed metrics_codec schema (always a full document)."""
+        return self._cached(
+            ("msgpack", sort) if top is None else None,
+            lambda: metrics_codec.pack(metrics_codec.metrics_to_compact(self.document(sort, top))))
+
+    def encode(self, sort="mem", top=None, base=None):
+        """Serialized document, or a delta against snapshot `base` when given."""
+        if base is None and sort == "mem" and top is None:
+            return self.body
+        canonical = top is None and (base is None or base.seq == self.seq - 1)
+
+        def build():
+            doc = self.document(sort, top)
+            if base is not None:
+                doc = metrics_delta(base.document(sort, top), doc)
+            return json.dumps(doc, separators=(",", ":")).encode("utf-8")
+
+        return self._cached((sort, base is not None) if canonical else None, build)
+
+
+# ==========================================
+# HISTORIA METRYK (ring buffer)
+# ==========================================
+
+class MetricsHistory:
+    """
+    Fixed-size ring buffer of sampled CPU, memory, swap and per-disk usage
+    (percent), stored column-wise in array('f') with array('d') timestamps.
+    Disks that stop reporting are dropped once they fall out of the window.
+    """
+
+    SERIES = ("cpu", "memory", "swap")
+
+    def __init__(self, size):
+        self.size = max(2, int(size))
+        self._lock = threading.Lock()
+        self._t = array("d", [0.0]) * self.size
+        self._series = {name: array("f", [math.nan]) * self.size for name in self.SERIES}
+        self._disks = {}
+        self._disk_seen = {}
+        self._pos = 0
+        self._count = 0
+        self._appends = 0
+
+    def append(self, data, ts=None):
+        values = {
+            "cpu": data.get("cpu", {}).get("usage_percent", math.nan),
+            "memory": data.get("memory", {}).get("percent", math.nan),
+            "swap": data.get("swap", {}).get("percent", math.nan),
+        }
+        disks = data.get("disks", {})
+        with self._lock:
+            i = self._pos
+            self._t[i] = time.time() if ts is None else ts
+            for name, v in values.items():
+                self._series[name][i] = v
+            for mount, d in disks.items():
+                if mount not in self._disks:
+                    self._disks[mount] = array("f", [math.nan]) * self.size
+                self._disks[mount][i] = d.get("percent", math.nan)
+                self._disk_seen[mount] = self._appends
+            for mount in list(self._disks):
+                if mount in disks:
+                    continue
+                if self._appends - self._disk_seen[mount] >= self.size:
+                    del self._disks[mount], self._disk_seen[mount]
+                else:
+                    self._disks[mount][i] = math.nan
+            self._pos = (i + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+            self._appends += 1
+
+    def _ordered(self, arr):
+        # kopia w kolejności chronologicznej (dwa kawałki przy zawinięciu bufora)
+        if self._count < self.size:
+            return arr[:self._count]
+        return arr[self._pos:] + arr[:self._pos]
+
+    def query(self, window, step):
+        """
+        Samples from the last `window` seconds averaged into `step`-second
+        buckets. Returns (start, t, columns): bucket offsets from `start` and
+        one list per series, with NaN where a bucket had no value.
+        """
+        start = time.time() - window
+        with self._lock:
+            ts = self._ordered(self._t)
+            cols = {name: self._ordered(arr) for name, arr in self._series.items()}
+            cols.update(("disk:" + m, self._ordered(arr)) for m, arr in self._disks.items())
+
+        first = next((k for k, t in enumerate(ts) if t >= start), len(ts))
+        buckets = []
+        index = {}
+        for k in range(first, len(ts)):
+            b = int((ts[k] - start) // step)
+            if b not in index:
+                index[b] = len(buckets)
+                buckets.append([])
+            buckets[index[b]].append(k)
+
+        def avg(arr, ks):
+            vals = [arr[k] for k in ks if not math.isnan(arr[k])]
+            return sum(vals) / len(vals) if vals else math.nan
+
+        t = [b * step for b in index]
+        out = {name: [avg(arr, ks) for ks in buckets] for name, arr in cols.items()}
+        return start, t, out
+
+
+history = MetricsHistory(config.METRICS_HISTORY_SIZE)
+
+class MetricsSampler:
+    """
+    Samples get_metrics() on a background thread every `interval` seconds and
+    keeps the latest document pre-serialized, so serving /metrics is a memory
+    copy no matter how many dashboards poll the agent.
+    """
+
+    def __init__(self, interval, history=30):
+        self.interval = max(0.2, float(interval))
+        self._cond = threading.Condition()
+        # ostatnie snapshoty - bazy dla odpowiedzi delta (?since=<seq>)
+        self._history = deque(maxlen=max(1, history))
+        # Sekwencja startuje od znacznika czasu, więc numery z poprzedniego
+        # uruchomienia agenta nigdy nie pokrywają się z bieżącymi.
+        self._seq = int(time.time() * 1000)
+        self._snapshot = None
+        self._thread = None
+        self._wake = threading.Event()
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                data = get_metrics()
+                history.append(data)
+                self._publish(data)
+            except Exception as e:
+                logging.warning("Metrics sample failed: %s", e)
+            self._wake.wait(max(0.0, self.interval - (time.monotonic() - started)))
+            self._wake.clear()
+
+    def _publish(self, data):
+        with self._cond:
+            seq = self._seq + 1
+        data["seq"] = seq
+        rankings = data.pop("rankings", {})
+        body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        snap = MetricsSnapshot(seq, data, body, rankings)
+        with self._cond:
+            self._seq = seq
+            self._snapshot = snap
+            self._history.append(snap)
+            self._cond.notify_all()
+
+    def latest(self, timeout=None):
+        """
+        Returns the newest snapshot. Before the first sample lands, waits up to
+        `timeout` seconds (default: one sampling interval) and returns None if
+        nothing was published in time.
+        """
+        self.start()
+        with self._cond:
+            if self._snapshot is None:
+                self._cond.wait_for(lambda: self._snapshot is not None,
+                                    self.interval if timeout is None else timeout)
+            return self._snapshot
+
+    def refresh(self, timeout=None):
+        """Wakes the sampler early and waits for the next snapshot."""
+        self.start()
+        with self._cond:
+            seq = self._seq
+            self._wake.set()
+            self._cond.wait_for(lambda: self._seq > seq,
+                                self.interval if timeout is None else timeout)
+            return self._snapshot
+
+    def wait_newer(self, seq, timeout):
+        """Blocks until a snapshot newer than `seq` exists (or timeout); returns the newest one."""
+        self.start()
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._snapshot is not None and (seq is None or self._seq > seq), timeout)
+            return self._snapshot
+
+    def get(self, seq):
+        """Snapshot with the given sequence number if it is still kept, else None."""
+        with self._cond:
+            for snap in reversed(self._history):
+                if snap.seq == seq:
+                    return snap
+        return None
+
+
+sampler = MetricsSampler(config.METRICS_SAMPLE_INTERVAL_SEC, config.METRICS_DELTA_HISTORY)
+
+# ==========================================
+# ZRZUTY EKRANU (różnicowe, kafelki)
+# ==========================================
+
+SCREEN_WIDTH = max(160, config.SCREENSHOT_WIDTH)
+SCREEN_QUALITY = min(max(config.SCREENSHOT_QUALITY, 10), 95)
+
+_pyautogui = None
+
+def get_cursor_pos():
+    global _pyautogui
+    if is_windows and user32:
+        pt = wintypes.POINT()
+        if user32.GetCursorPos(ctypes.byref(pt)):
+            return pt.x, pt.y
+    if _pyautogui is None:
+        try:
+            import pyautogui
+            _pyautogui = pyautogui
+        except Exception:
+            _pyautogui = False  # brak pyautogui - nie próbujemy importu przy każdej klatce
+    if not _pyautogui:
+        return None
+    try:
+        p = _pyautogui.position()
+        return p.x, p.y
+    except Exception:
+        return None
+
+# nazwa z configu -> filtr Pillow; tańsze od LANCZOS przy zmniejszaniu całego ekranu
+_RESAMPLE_FILTERS = ("nearest", "box", "bilinear", "hamming", "bicubic", "lanczos")
+
+def _resample_filter():
+    name = config.SCREENSHOT_RESAMPLE.lower()
+    if name not in _RESAMPLE_FILTERS:
+        name = "bilinear"
+    return getattr(Image.Resampling, name.upper())
+
+def _webp_supported():
+    try:
+        from PIL import features
+        return features.check("webp")
+    except Exception:
+        return False
+
+SCREEN_FORMATS = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+def screen_format(name=None):
+    """Requested (or configured) output format, falling back to JPEG without WebP support."""
+    name = (name or config.SCREENSHOT_FORMAT).lower()
+    if name == "jpg":
+        name = "jpeg"
+    if name not in SCREEN_FORMATS or (name == "webp" and not _webp_supported()):
+        return "jpeg"
+    return name
+
+def scale_image(img, width, height=None):
+    """
+    Downscales to `width` (and at most `height`) keeping the aspect ratio.
+    reducing_gap lets Pillow shrink by an integer factor with a box filter
+    first, so the configured filter only runs on a ~2x larger image.
+    """
+    w, h = img.size
+    ratio = min(width / w, (height / h) if height else 1.0, 1.0)
+    size = (max(1, int(w * ratio)), max(1, int(h * ratio)))
+    if size == img.size:
+        return img
+    return img.resize(size, _resample_filter(), reducing_gap=2.0)
+
+def encode_image(img, fmt="jpeg", quality=None):
+    quality = SCREEN_QUALITY if quality is None else quality
+    img_io = io.BytesIO()
+    if fmt == "webp":
+        img.save(img_io, 'WEBP', quality=quality, method=0)
+    else:
+        # 4:2:0, bez optymalizacji tablic Huffmana - najtańsze kodowanie
+        img.save(img_io, 'JPEG', quality=quality, subsampling=2, optimize=False)
+    return img_io.getvalue()
+
+def _encode_frame(img):
+    return encode_image(img, screen_format())
+
+class FrameCache:
+    """
+    Short-lived cache of captured / encoded frames. Concurrent requests for the
+    same key wait for the first one instead of capturing and encoding again.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = max(0.0, float(ttl))
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._pending = {}
+
+    def get(self, key, produce):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    return entry[1]
+                event = self._pending.get(key)
+                if event is None:
+                    event = self._pending[key] = threading.Event()
+                    break
+            event.wait(5.0)
+
+        stored = False
+        try:
+            value = produce()
+            stored = True
+            return value
+        finally:
+            with self._lock:
+                if stored:
+                    now = time.monotonic()
+                    for k in [k for k, (exp, _) in self._entries.items() if exp <= now]:
+                        del self._entries[k]
+                    self._entries[key] = (now + self.ttl, value)
+                self._pending.pop(key).set()
+
+frames = FrameCache(config.SCREENSHOT_CACHE_SEC)
+
+def _screen_args(default_width):
+    """?w=<px>&q=<quality>&fmt=jpeg|webp, clamped."""
+    w = request.args.get("w", type=int) or default_width
+    w = min(max(w, 160), max(160, config.SCREENSHOT_MAX_WIDTH))
+    q = request.args.get("q", type=int) or SCREEN_QUALITY
+    q = min(max(q, 10), 95)
+    return w, q, screen_format(request.args.get("fmt"))
+
+class ScreenDiffer:
+    """
+    Keeps the last scaled frame of the screen split into `tile` x `tile`
+    blocks. Every capture hashes the raw mss buffer block by block (crc32 on
+    memoryview slices, no copies); when no block and no cursor moved, nothing
+    is converted, scaled or encoded. Otherwise the frame is rebuilt and only
+    blocks whose scaled pixels really differ get a new frame id.
+
+    encode(since) answers a client that already has frame `since`: None (no
+    change), the changed tiles, or a full JPEG when the base is unknown or
+    most of the screen changed. Encoded tiles / frames are cached until the
+    block changes again, so concurrent viewers share the work.
+    """
+
+    def __init__(self, tile, history, out_width=SCREEN_WIDTH):
+        self.tile = max(16, int(tile) // 8 * 8)  # wielokrotność bloku JPEG
+        self.out_width = out_width
+        self._lock = threading.Lock()
+        self.frame_id = int(time.time() * 1000)
+        self._changes = deque(maxlen=max(1, history))  # (frame_id, kafelki)
+        self._geom = None
+        self._raw = None
+        self._cursor = None
+        self._image = None
+        self._shot = None
+        self._cols = self._out_h = 0
+        self._out_hashes = []
+        self._tile_frame = {}
+        self._full_frame = None
+
+    def _grid(self, width, height):
+        out_h = max(1, int(height * self.out_width / width))
+        cols = math.ceil(self.out_width / self.tile)
+        rows = math.ceil(out_h / self.tile)
+        sx, sy = width / self.out_width, height / out_h
+        xs = [min(width, round(c * self.tile * sx)) for c in range(cols + 1)]
+        ys = [min(height, round(r * self.tile * sy)) for r in range(rows + 1)]
+        return out_h, cols, rows, xs, ys
+
+    def _raw_hashes(self, raw, width, height, cols, rows, xs, ys):
+        mv = memoryview(raw)
+        stride = width * 4
+        hashes = [0] * (cols * rows)
+        spans = [(c, xs[c] * 4, xs[c + 1] * 4) for c in range(cols)]
+        for r in range(rows):
+            base_idx = r * cols
+            for y in range(ys[r], ys[r + 1]):
+                off = y * stride
+                for c, x0, x1 in spans:
+                    hashes[base_idx + c] = zlib.crc32(mv[off + x0:off + x1], hashes[base_idx + c])
+        return hashes
+
+    def _tile_box(self, i, cols, out_h):
+        x, y = (i % cols) * self.tile, (i // cols) * self.tile
+        return (x, y, min(x + self.tile, self.out_width), min(y + self.tile, out_h))
+
+    def _render(self, sct_img, cursor, width=None):
+        img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
+        if cursor:
+            rel_x, rel_y = cursor
+            d = ImageDraw.Draw(img)
+            r = 12
+            d.ellipse((rel_x - r, rel_y - r, rel_x + r, rel_y + r), fill=(255, 0, 0))
+        if width is None:
+            return img.resize((self.out_width, self._grid(*sct_img.size)[0]), _resample_filter(), reducing_gap=2.0)
+        return scale_image(img, width)
+
+    def snapshot(self):
+        """(frame_id, last capture) read together, or (None, None) before the first capture."""
+        with self._lock:
+            if self._shot is None:
+                return None, None
+            return self.frame_id, self._shot
+
+    def render(self, shot, width):
+        """A capture from snapshot() scaled to another width."""
+        return self._render(*shot, width=width)
+
+    def update(self, sct_img, monitor, cursor):
+        """Feeds a capture; cursor is relative to the monitor (or None)."""
+        width, height = sct_img.size
+        out_h, cols, rows, xs, ys = self._grid(width, height)
+        raw = self._raw_hashes(sct_img.raw, width, height, cols, rows, xs, ys)
+        geom = (monitor["left"], monitor["top"], width, height)
+
+        with self._lock:
+            if geom != self._geom:
+                dirty = None
+            else:
+                dirty = {i for i, (a, b) in enumerate(zip(raw, self._raw)) if a != b}
+                if cursor != self._cursor:
+                    # kursor jest dorysowywany - kafelki starej i nowej pozycji
+                    for pos in (self._cursor, cursor):
+                        if pos is None: continue
+                        c0 = max(0, min(cols - 1, int(pos[0] * cols / width)))
+                        r0 = max(0, min(rows - 1, int(pos[1] * rows / height)))
+                        for r in range(max(0, r0 - 1), min(rows, r0 + 2)):
+                            for c in range(max(0, c0 - 1), min(cols, c0 + 2)):
+                                dirty.add(r * cols + c)
+                if not dirty:
+                    return
+            self._raw, self._cursor = raw, cursor
+
+        image = self._render(sct_img, cursor)
+        tiles = cols * rows
+        if dirty is None:
+            candidates = range(tiles)
+        else:
+            # filtr skalowania sięga kilka pikseli do sąsiednich kafelków
+            candidates = set()
+            for i in dirty:
+                r0, c0 = divmod(i, cols)
+                for r in range(max(0, r0 - 1), min(rows, r0 + 2)):
+                    for c in range(max(0, c0 - 1), min(cols, c0 + 2)):
+                        candidates.add(r * cols + c)
+        hashes = {i: zlib.crc32(image.crop(self._tile_box(i, cols, out_h)).tobytes()) for i in candidates}
+
+        with self._lock:
+            if dirty is None:
+                self._geom = geom
+                self._out_hashes = [hashes[i] for i in range(tiles)]
+                self._changes.clear()
+                self._tile_frame.clear()
+                changed = set(range(tiles))
+            else:
+                changed = {i for i, h in hashes.items() if self._out_hashes[i] != h}
+                if not changed:
+                    return
+                for i in changed:
+                    self._out_hashes[i] = hashes[i]
+                    self._tile_frame.pop(i, None)
+            self.frame_id += 1
+            self._changes.append((self.frame_id, frozenset(changed)))
+            self._image = image
+            self._shot = (sct_img, cursor)
+            self._full_frame = None
+            self._cols, self._out_h = cols, out_h
+
+    def _encode_full(self, image, frame_id):
+        """Encodes outside the lock (update() never waits for a viewer); kept if the frame is still current."""
+        data = _encode_frame(image)
+        with self._lock:
+            if self._image is image:
+                self._full_frame = data
+        return frame_id, data
+
+    def full(self):
+        """(frame_id, whole frame encoded) or (None, None) before the first capture."""
+        with self._lock:
+            if self._image is None:
+                return None, None
+            if self._full_frame is not None:
+                return self.frame_id, self._full_frame
+            # obrazy nie są modyfikowane w miejscu - wystarczy referencja
+            image, frame_id = self._image, self.frame_id
+        return self._encode_full(image, frame_id)
+
+    def encode(self, since):
+        """
+        ("same", frame_id, None) | ("full", frame_id, image) | ("tiles", frame_id, body)
+
+        body: JSON header line {"frame", "base", "width", "height", "tile",
+        "tiles": [[x, y, length], ...]} followed by the encoded tiles back to back.
+        """
+        with self._lock:
+            if self._image is None:
+                return "full", None, None
+            if since == self.frame_id:
+                return "same", since, None
+            known = bool(self._changes) and since is not None and self._changes[0][0] - 1 <= since < self.frame_id
+            if known:
+                tiles = set()
+                for fid, changed in self._changes:
+                    if fid > since:
+                        tiles |= changed
+                total = len(self._out_hashes)
+            image, frame_id = self._image, self.frame_id
+            if not known or len(tiles) * 2 > total:
+                if self._full_frame is not None:
+                    return "full", frame_id, self._full_frame
+                full = True
+            else:
+                full = False
+                cols, out_h = self._cols, self._out_h
+                cached = {i: self._tile_frame.get(i) for i in tiles}
+        if full:
+            return ("full",) + self._encode_full(image, frame_id)
+
+        # kodowanie poza blokadą - wątek przechwytywania nie czeka na widzów
+        fresh = {i: _encode_frame(image.crop(self._tile_box(i, cols, out_h)))
+                 for i, data in cached.items() if data is None}
+        if fresh:
+            with self._lock:
+                if self._image is image:
+                    self._tile_frame.update(fresh)
+        index, blobs = [], []
+        for i in sorted(tiles):
+            data = cached[i] if cached[i] is not None else fresh[i]
+            x, y = (i % cols) * self.tile, (i // cols) * self.tile
+            index.append([x, y, len(data)])
+            blobs.append(data)
+        header = {"frame": frame_id, "base": since, "width": self.out_width,
+                  "height": out_h, "tile": self.tile, "tiles": index}
+        return "tiles", frame_id, json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n" + b"".join(blobs)
+
+
+screen = ScreenDiffer(config.SCREENSHOT_TILE_SIZE, config.SCREENSHOT_DIFF_HISTORY)
+
+
+class CaptureWorker:
+    """
+    Owns one long-lived mss context on its own thread (mss handles are not
+    shared between threads). While somebody asked for the screen in the last
+    `idle_sec` seconds it grabs the monitor under the cursor `fps` times per
+    second, feeds the frame to on_frame() and publishes it in `latest`
+    (a plain attribute swap - readers never take a lock). The monitor list
+    comes from the context and is re-read every `monitor_refresh` seconds or
+    after a failed grab. Window grabs for /screenshot/<pid> run as jobs on
+    the same thread.
+    """
+
+    def __init__(self, fps, idle_sec, monitor_refresh, on_frame=None):
+        self.interval = 1.0 / max(0.1, float(fps))
+        self.idle_sec = max(self.interval, float(idle_sec))
+        self.monitor_refresh = monitor_refresh
+        self.on_frame = on_frame
+        self.latest = None  # (monotonic, sct_img, monitor, cursor)
+        self._wanted_until = 0.0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._jobs = deque()
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="screen-capture", daemon=True)
+            self._thread.start()
+
+    def frame(self, timeout):
+        """Subscribes and returns a frame at most one interval old (None on timeout)."""
+        self.start()
+        now = time.monotonic()
+        idle = now >= self._wanted_until
+        self._wanted_until = now + self.idle_sec
+        if idle:
+            self._wake.set()
+        fresh = lambda: self.latest is not None and time.monotonic() - self.latest[0] <= 2 * self.interval
+        if fresh():
+            return self.latest
+        with self._cond:
+            self._cond.wait_for(fresh, timeout)
+        return self.latest if fresh() else None
+
+    def grab(self, rect, timeout):
+        """Grabs a rectangle (clipped to the virtual screen's top-left) on the capture thread."""
+        self.start()
+        job = {"rect": rect, "done": threading.Event()}
+        self._jobs.append(job)
+        self._wake.set()
+        if not job["done"].wait(timeout):
+            raise TimeoutError("capture thread busy")
+        if "error" in job:
+            raise job["error"]
+        return job["result"]
+
+    def _run(self):
+        while True:
+            try:
+                with mss.mss() as sct:
+                    self._loop(sct)
+            except Exception as e:
+                logging.warning("Screen capture failed: %s", e)
+                time.sleep(1.0)
+
+    def _loop(self, sct):
+        """Runs until the monitor list is due for a refresh; the caller reopens the context."""
+        opened = time.monotonic()
+        monitors = sct.monitors
+        while time.monotonic() - opened < self.monitor_refresh:
+            while self._jobs:
+                job = self._jobs.popleft()
+                try:
+                    rect = dict(job["rect"])
+                    rect["left"] = max(rect["left"], monitors[0]["left"])
+                    rect["top"] = max(rect["top"], monitors[0]["top"])
+                    job["result"] = sct.grab(rect)
+                except Exception as e:
+                    job["error"] = e
+                job["done"].set()
+
+            started = time.monotonic()
+            if started < self._wanted_until:
+                cursor = get_cursor_pos()
+                monitor = monitors[1] if len(monitors) > 1 else monitors[0]
+                if cursor:
+                    cx, cy = cursor
+                    for m in monitors[1:] or monitors:
+                        if m["left"] <= cx < m["left"] + m["width"] and m["top"] <= cy < m["top"] + m["height"]:
+                            monitor = m
+                            break
+                    cursor = (cx - monitor["left"], cy - monitor["top"])
+                sct_img = sct.grab(monitor)
+                if self.on_frame is not None:
+                    self.on_frame(sct_img, monitor, cursor)
+                self.latest = (time.monotonic(), sct_img, monitor, cursor)
+                with self._cond:
+                    self._cond.notify_all()
+                self._wake.wait(max(0.0, self.interval - (time.monotonic() - started)))
+            else:
+                self._wake.wait(self.monitor_refresh)
+            self._wake.clear()
+
+
+capture = CaptureWorker(config.SCREENSHOT_CAPTURE_FPS, config.SCREENSHOT_SUBSCRIBE_SEC,
+                        config.SCREENSHOT_MONITOR_REFRESH_SEC, on_frame=screen.update)
+
 # --- ENDPOINTS FLASK ---
+def _wants_binary():
+    """Accept: application/x-msgpack (preferred over JSON) or ?format=msgpack."""
+    if not metrics_codec.available():
+        return False
+    if request.args.get("format") == "msgpack":
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", metrics_codec.MIMETYPE])
+    return best == metrics_codec.MIMETYPE
+
+def _reply(obj, status=200):
+    """jsonify() or MessagePack, depending on what the client asked for."""
+    if _wants_binary():
+        resp = app.response_class(metrics_codec.pack(obj), status=status, mimetype=metrics_codec.MIMETYPE)
+    else:
+        resp = jsonify(obj)
+        resp.status_code = status
+    resp.vary.add("Accept")
+    return resp
+
+def _ranking_args():
+    sort = request.args.get("sort", "mem")
+    top = request.args.get("top", type=int)
+    if top is not None and top <= 0:
+        top = None
+    return sort, top
+
 @app.route("/metrics")
-def metrics(): return jsonify(get_metrics())
+def metrics():
+    sort, top = _ranking_args()
+    if sort not in PROCESS_RANKINGS:
+        return jsonify({"error": "unknown_sort", "allowed": list(PROCESS_RANKINGS)}), 400
+
+    if process_tracker.demand(sort):
+        snap = sampler.latest()
+    else:
+        # ranking nie był dotąd zbierany - wymuszamy świeży sample
+        snap = sampler.refresh()
+    if snap is None:
+        return jsonify({"error": "metrics_unavailable"}), 503
+    # ranking dopiero zbierany (io bez poprzednich liczników) - pusta lista
+    # nie znaczy "brak I/O"; nagłówek mówi klientowi, żeby zapytał ponownie
+    warming = not process_tracker.ready(sort)
+
+    # ?since=<seq> -> tylko zmiany względem snapshotu, który klient już ma;
+    # nieznana (zbyt stara) baza daje pełny dokument
+    # MessagePack zawsze jako pełny dokument (stały schemat metrics_codec)
+    binary = _wants_binary()
+    since = request.args.get("since", type=int)
+    base = sampler.get(since) if since is not None and not binary else None
+
+    etag = str(snap.seq) if sort == "mem" and top is None else f"{snap.seq}-{sort}-{top or 0}"
+    if base is not None:
+        etag += f"-d{base.seq}"
+    if binary:
+        etag += "-m"
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    elif binary:
+        resp = app.response_class(snap.encode_compact(sort, top), mimetype=metrics_codec.MIMETYPE)
+    else:
+        resp = app.response_class(snap.encode(sort, top, base), mimetype="application/json")
+    resp.set_etag(etag)
+    resp.vary.add("Accept")
+    resp.headers["X-Metrics-Seq"] = str(snap.seq)
+    resp.headers["Cache-Control"] = "no-cache"
+    if warming:
+        resp.headers["X-Metrics-Ranking-Warming"] = sort
+        resp.headers["Retry-After"] = str(max(1, math.ceil(sampler.interval)))
+    return resp
+
+# strumień SSE zajmuje wątek serwera na cały czas połączenia
+stream_slots = threading.BoundedSemaphore(max(1, config.METRIX_SERVER_MAX_STREAMS))
+STREAM_RETRY_AFTER_SEC = 30
+
+@app.route("/metrics/stream")
+def metrics_stream():
+    """
+    Server-sent events: every new sample is pushed as soon as the sampler
+    publishes it. The first event is a full document ("metrics"), later ones
+    are deltas against the previous event ("patch", same format as ?since=).
+    Last-Event-ID (or ?since=) lets a reconnecting client start with a delta.
+    At most METRIX_SERVER_MAX_STREAMS streams run at once; past that the
+    answer is 503 with Retry-After and the client should poll /metrics.
+    """
+    sort, top = _ranking_args()
+    if sort not in PROCESS_RANKINGS:
+        return jsonify({"error": "unknown_sort", "allowed": list(PROCESS_RANKINGS)}), 400
+    if not stream_slots.acquire(blocking=False):
+        resp = jsonify({"error": "too_many_streams"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(STREAM_RETRY_AFTER_SEC)
+        return resp
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    if last_id is None:
+        last_id = request.args.get("since", type=int)
+
+    def gen():
+        base = sampler.get(last_id) if last_id is not None else None
+        seq = last_id if base is not None else None
+        yield "retry: 3000\n\n"
+        while True:
+            process_tracker.demand(sort)
+            snap = sampler.wait_newer(seq, config.METRICS_STREAM_KEEPALIVE_SEC)
+            if snap is None or snap.seq == seq:
+                yield ": keep-alive\n\n"
+                continue
+            event = "patch" if base is not None else "metrics"
+            body = snap.encode(sort, top, base).decode("utf-8")
+            yield f"id: {snap.seq}\nevent: {event}\ndata: {body}\n\n"
+            base, seq = snap, snap.seq
+
+    resp = app.response_class(gen(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    resp.call_on_close(stream_slots.release)
+    return resp
+
+@app.route("/metrics/history")
+def metrics_history():
+    """
+    ?window=<s>&step=<s>[&format=json|f32]
+
+    json: columnar {"start", "step", "t": [offsets], "cpu": [...], "memory": [...],
+          "swap": [...], "disks": {mount: [...]}}, percentages, null = no data.
+    f32:  one JSON header line {"start", "step", "count", "columns"} followed by
+          the columns as little-endian float32 (t first, NaN = no data).
+    """
+    window = request.args.get("window", 600.0, type=float)
+    step = request.args.get("step", sampler.interval, type=float)
+    window = min(max(window, sampler.interval), history.size * sampler.interval)
+    step = min(max(step, sampler.interval), window)
+    start, t, cols = history.query(window, step)
+
+    if request.args.get("format") == "f32":
+        names = ["t"] + list(cols)
+        header = {"start": start, "step": step, "count": len(t), "columns": names}
+        body = io.BytesIO()
+        body.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+        for values in [t] + list(cols.values()):
+            arr = array("f", values)
+            if sys.byteorder == "big":
+                arr.byteswap()
+            body.write(arr.tobytes())
+        return app.response_class(body.getvalue(), mimetype="application/octet-stream")
+
+    clean = lambda vals: [None if math.isnan(v) else round(v, 2) for v in vals]
+    payload = {"start": round(start, 3), "step": step, "t": t, "disks": {}}
+    for name, vals in cols.items():
+        if name.startswith("disk:"):
+            payload["disks"][name[5:]] = clean(vals)
+        else:
+            payload[name] = clean(vals)
+    return jsonify(payload)
 
 @app.route("/screenshot/<int:pid>")
 def screenshot_pid(pid):
+    """Window of the process (?w=&q=&fmt= as for /screenshot/full, default 400px wide)."""
     if not mss or not Image:
         return jsonify({"error": "screenshot_unavailable"}), 503
     proc_name = "Unknown"
@@ -182,18 +1201,16 @@ def screenshot_pid(pid):
     except: pass
     rect = get_window_rect_by_pid(pid)
     if rect:
+        w, q, fmt = _screen_args(400)
+
+        def produce():
+            sct_img = capture.grab(rect, config.SCREENSHOT_TIMEOUT)
+            img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
+            return encode_image(scale_image(img, w, w * 3 // 4), fmt, q)
+
         try:
-            with mss.mss() as sct:
-                monitor = sct.monitors[0]
-                if rect['left'] < monitor['left']: rect['left'] = monitor['left']
-                if rect['top'] < monitor['top']: rect['top'] = monitor['top']
-                sct_img = sct.grab(rect)
-                img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-                img.thumbnail((400, 300))
-                img_io = io.BytesIO()
-                img.save(img_io, 'JPEG', quality=70)
-                img_io.seek(0)
-                return send_file(img_io, mimetype='image/jpeg')
+            body = frames.get(("pid", pid, w, q, fmt), produce)
+            return app.response_class(body, mimetype=SCREEN_FORMATS[fmt])
         except: pass
     reason = "Running" if not is_windows else "Background"
     fallback = generate_fallback_image(pid, proc_name, reason)
@@ -203,55 +1220,46 @@ def screenshot_pid(pid):
 
 @app.route("/screenshot/full")
 def screenshot_full():
+    """
+    Monitor under the cursor, ?w=<px>&q=<quality>&fmt=jpeg|webp (defaults from
+    config). With ?tiles=1[&since=<frame>] at the default size only the tiles
+    changed since that frame are sent (see ScreenDiffer.encode), 304 when
+    nothing changed; X-Screen-Frame carries the frame id. Frames come from
+    the capture thread; viewers within SCREENSHOT_CACHE_SEC share one encode
+    per size.
+    """
     if not mss or not Image or not ImageDraw:
         return jsonify({"error": "screenshot_unavailable"}), 503
 
-    def get_cursor_pos():
-        if is_windows and user32:
-            pt = wintypes.POINT()
-            if user32.GetCursorPos(ctypes.byref(pt)):
-                return pt.x, pt.y
-        try:
-            import pyautogui
-            p = pyautogui.position()
-            return p.x, p.y
-        except Exception:
-            return None
-
-    try:
-        with mss.mss() as sct:
-            cursor = get_cursor_pos()
-            monitors = sct.monitors
-            monitor = monitors[1] if len(monitors) > 1 else monitors[0]
-            if cursor:
-                cx, cy = cursor
-                for m in monitors[1:] or monitors:
-                    if m["left"] <= cx < m["left"] + m["width"] and m["top"] <= cy < m["top"] + m["height"]:
-                        monitor = m
-                        break
-
-            sct_img = sct.grab(monitor)
-            img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-
-            if cursor:
-                cx, cy = cursor
-                rel_x = cx - monitor["left"]
-                rel_y = cy - monitor["top"]
-                d = ImageDraw.Draw(img)
-                r = 12
-                d.ellipse((rel_x - r, rel_y - r, rel_x + r, rel_y + r), fill=(255, 0, 0))
-
-            img = img.resize((800, int(img.size[1]*(800/img.size[0]))), Image.Resampling.LANCZOS)
-            img_io = io.BytesIO()
-            img.save(img_io, 'JPEG', quality=65)
-            img_io.seek(0)
-            return send_file(img_io, mimetype='image/jpeg')
-    except:
+    if capture.frame(config.SCREENSHOT_TIMEOUT) is None:
         fallback = generate_fallback_image(0, "Error", "No Display")
         if fallback:
             return send_file(fallback, mimetype='image/jpeg')
         return jsonify({"error": "screenshot_unavailable"}), 503
 
+    w, q, fmt = _screen_args(SCREEN_WIDTH)
+    default = (w, q, fmt) == (SCREEN_WIDTH, SCREEN_QUALITY, screen_format())
+    if default and request.args.get("tiles") in ("1", "true", "yes"):
+        kind, frame, body = screen.encode(request.args.get("since", type=int))
+    elif default:
+        kind, (frame, body) = "full", screen.full()
+    else:
+        frame, shot = screen.snapshot()
+        kind, body = "full", None
+        if shot is not None:
+            body = frames.get(("full", frame, w, q, fmt), lambda: encode_image(screen.render(shot, w), fmt, q))
+    if frame is None or (kind == "full" and body is None):
+        return jsonify({"error": "screenshot_unavailable"}), 503
+    if kind == "same":
+        resp = app.response_class(status=304)
+    elif kind == "tiles":
+        resp = app.response_class(body, mimetype="application/x-screen-tiles")
+    else:
+        resp = app.response_class(body, mimetype=SCREEN_FORMATS[fmt])
+    resp.headers["X-Screen-Frame"] = str(frame)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
 def parse_commands_file():
     cmd_list = []
     if not os.path.exists(COMMANDS_FILE): return cmd_list
@@ -265,7 +1273,7 @@ def parse_commands_file():
     return cmd_list
 
 @app.route("/command_list")
-def command_list(): return jsonify({hostname: parse_commands_file()})
+def command_list(): return _reply({hostname: parse_commands_file()})
 
 @app.route("/command", methods=["POST"])
 def command():
@@ -283,12 +1291,12 @@ def kill(pid):
 @app.route("/clipboard", methods=["GET"])
 def clipboard():
     if not pyperclip:
-        return jsonify({"error": "clipboard_unavailable"}), 500
+        return _reply({"error": "clipboard_unavailable"}, 500)
     try:
         text = pyperclip.paste()
         if isinstance(text, str) and text:
             size = len(text.encode("utf-8"))
-            return jsonify({
+            return _reply({
                 "type": "text",
                 "encoding": "plain" if size < 64_000 else "stream",
                 "size": size,
@@ -297,7 +1305,7 @@ def clipboard():
     except Exception as e:
         logging.warning(f"Clipboard read failed: {e}")
 
-    return jsonify({
+    return _reply({
         "type": "unknown",
         "encoding": "plain",
         "size": 0,
@@ -514,6 +1522,28 @@ def create_tray_icon():
     return image
 
 def run_flask_thread():
+    """
+    METRIX_SERVER_MODE=waitress: bounded pool of METRIX_SERVER_THREADS workers
+    (each open /metrics/stream holds one), listen backlog and idle keep-alive
+    timeout from config. "dev" or missing waitress: Flask's threaded server.
+    """
+    if config.METRIX_SERVER_MODE == "waitress":
+        try:
+            from waitress import serve
+        except ImportError:
+            logging.warning("waitress not installed - falling back to the Flask development server")
+        else:
+            serve(
+                app,
+                host=config.METRIX_SERVER_HOST,
+                port=config.METRIX_SERVER_PORT,
+                threads=max(1, config.METRIX_SERVER_THREADS),
+                backlog=max(1, config.METRIX_SERVER_BACKLOG),
+                connection_limit=max(1, config.METRIX_SERVER_CONNECTION_LIMIT),
+                channel_timeout=config.METRIX_SERVER_KEEPALIVE_SEC,
+                ident="metrix",
+            )
+            return
     app.run(
         host=config.METRIX_SERVER_HOST,
         port=config.METRIX_SERVER_PORT,
@@ -533,6 +1563,7 @@ if __name__ == "__main__":
         
         # Init
         psutil.cpu_percent(interval=None)
+        sampler.start()
         if not os.path.exists(COMMANDS_DIR):
             try: os.makedirs(COMMANDS_DIR)
             except: pass
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import ipaddress
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+HOST_BLOCK = re.compile(r"host\s+(\S+)\s*{[^}]*}", re.DOTALL)
+HARDWARE = re.compile(r"hardware\s+ethernet\s+([0-9A-Fa-f:]+)\s*;")
+FIXED_ADDRESS = re.compile(r"fixed-address\s+([\d.]+)\s*;")
+
+VALID_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+VALID_MAC = re.compile(r"^[0-9A-Fa-f]{2}(:[0-9A-Fa-f]{2}){5}$")
+
+
+def _valid_ip(ip: str) -> bool:
+    try:
+        ipaddress.IPv4Address(ip)
+    except ValueError:
+        return False
+    return True
+
+
+class HostBlock:
+    __slots__ = ("name", "mac", "ip", "text")
+
+    def __init__(self, name: str, mac: Optional[str], ip: Optional[str], text: str):
+        self.name = name
+        self.mac = mac.lower() if mac else None
+        self.ip = ip
+        self.text = text
+
+    @classmethod
+    def parse(cls, m: "re.Match") -> "HostBlock":
+        text = m.group(0)
+        mac = HARDWARE.search(text)
+        ip = FIXED_ADDRESS.search(text)
+        return cls(m.group(1), mac.group(1) if mac else None, ip.group(1) if ip else None, text)
+
+    @classmethod
+    def render(cls, name: str, mac: str, ip: str) -> "HostBlock":
+        text = (
+            f"host {name} {{\n"
+            f"    hardware ethernet {mac};\n"
+            f"    fixed-address {ip};\n"
+            f"}}"
+        )
+        return cls(name, mac, ip, text)
+
+
+class DhcpConfigManager:
+    """
+    dhcp_clients.conf as a list of segments (host blocks and the text between
+    them) with an index of host blocks by MAC, IP and name.
+
+    register() replaces the block matching the MAC or IP (or appends a new
+    one) under a lock and writes the file atomically: temp file in the same
+    directory, fsync, rename. Comments and other text are kept. The file is
+    re-read only when its inode, size or mtime changed. The dhcpd restart is
+    debounced, so a burst of registrations ends in a single restart, but it is
+    never postponed more than `max_delay` seconds after the first pending
+    change; flush() runs a pending restart right away (on shutdown).
+    """
+
+    def __init__(self, path: str, restart_cmd: Sequence[str], debounce: float = 5.0, max_delay: float = 30.0):
+        self.path = path
+        self.restart_cmd = list(restart_cmd)
+        self.debounce = debounce
+        self.max_delay = max(debounce, max_delay)
+        self._lock = threading.RLock()
+        self._segments: List[Union[str, HostBlock, None]] = []
+        self._by_mac: Dict[str, int] = {}
+        self._by_ip: Dict[str, int] = {}
+        self._by_name: Dict[str, int] = {}
+        self._stat = None
+        self._restart_timer: Optional[threading.Timer] = None
+        self._restart_pending_since: Optional[float] = None
+
+    # -- index ---------------------------------------------------------
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _load(self):
+        stat = self._file_stat()
+        if stat is not None and stat == self._stat:
+            return
+        try:
+            with open(self.path, "r") as f:
+                content = f.read()
+        except FileNotFoundError:
+            content = ""
+        self._segments = []
+        pos = 0
+        for m in HOST_BLOCK.finditer(content):
+            if m.start() > pos:
+                self._segments.append(content[pos:m.start()])
+            self._segments.append(HostBlock.parse(m))
+            pos = m.end()
+        if pos < len(content):
+            self._segments.append(content[pos:])
+        self._reindex()
+        self._stat = stat
+
+    def _reindex(self):
+        self._by_mac, self._by_ip, self._by_name = {}, {}, {}
+        for i, seg in enumerate(self._segments):
+            if isinstance(seg, HostBlock):
+                self._index(i, seg)
+
+    def _index(self, i: int, block: HostBlock):
+        if block.mac: self._by_mac[block.mac] = i
+        if block.ip: self._by_ip[block.ip] = i
+        self._by_name[block.name] = i
+
+    def _unindex(self, block: HostBlock):
+        for index, key in ((self._by_mac, block.mac), (self._by_ip, block.ip), (self._by_name, block.name)):
+            if key is not None:
+                index.pop(key, None)
+
+    def find(self, mac: Optional[str] = None, ip: Optional[str] = None, name: Optional[str] = None) -> Optional[HostBlock]:
+        with self._lock:
+            self._load()
+            for index, key in ((self._by_mac, mac.lower() if mac else None), (self._by_ip, ip), (self._by_name, name)):
+                if key is not None and key in index:
+                    return self._segments[index[key]]
+        return None
+
+    # -- zapis ---------------------------------------------------------
+    def register(self, hostname: str, mac: str, ip: str):
+        """Adds or replaces the host block; ValueError on values dhcpd would reject."""
+        if not hostname or not VALID_NAME.match(hostname):
+            raise ValueError(f"invalid hostname: {hostname!r}")
+        if not mac or not VALID_MAC.match(mac):
+            raise ValueError(f"invalid MAC address: {mac!r}")
+        if not ip or not _valid_ip(ip):
+            raise ValueError(f"invalid IP address: {ip!r}")
+        with self._lock:
+            self._load()
+            block = HostBlock.render(hostname, mac, ip)
+            hits = sorted({self._by_mac.get(block.mac), self._by_ip.get(ip)} - {None})
+            if hits:
+                for i in hits:
+                    self._unindex(self._segments[i])
+                    self._segments[i] = None
+                self._segments[hits[0]] = block
+                self._index(hits[0], block)
+            else:
+                last = next((s for s in reversed(self._segments) if s is not None), None)
+                if isinstance(last, HostBlock):
+                    self._segments.append("\n\n")
+                elif last and not last.endswith("\n"):
+                    self._segments.append("\n")
+                self._segments.append(block)
+                self._index(len(self._segments) - 1, block)
+            if len(hits) > 1:
+                self._segments = [s for s in self._segments if s is not None]
+                self._reindex()
+            self._write()
+        self.schedule_restart()
+
+    def _render(self) -> str:
+        out = "".join(s.text if isinstance(s, HostBlock) else s for s in self._segments if s is not None)
+        return out if out.endswith("\n") else out + "\n"
+
+    def _write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".dhcp_clients.", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self._render())
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                st = os.stat(self.path)
+                os.chmod(tmp, st.st_mode & 0o7777)
+                os.chown(tmp, st.st_uid, st.st_gid)
+            except (OSError, AttributeError):
+                pass
+            os.replace(tmp, self.path)
+        except BaseException:
+            try: os.unlink(tmp)
+            except OSError: pass
+            raise
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try: os.fsync(dir_fd)
+            finally: os.close(dir_fd)
+        except OSError:
+            pass
+        self._stat = self._file_stat()
+
+    # -- restart dhcpd -------------------------------------------------
+    def schedule_restart(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._restart_pending_since is None:
+                self._restart_pending_since = now
+            if self._restart_timer is not None:
+                self._restart_timer.cancel()
+            delay = min(self.debounce, self._restart_pending_since + self.max_delay - now)
+            self._restart_timer = threading.Timer(max(0.0, delay), self._restart)
+            self._restart_timer.daemon = True
+            self._restart_timer.start()
+
+    def flush(self):
+        """Runs a pending (debounced) restart now; no-op when nothing is pending."""
+        with self._lock:
+            timer = self._restart_timer
+            if timer is None:
+                return
+            timer.cancel()
+        self._restart()
+
+    def _restart(self):
+        with self._lock:
+            if self._restart_timer is None:
+                return  # już wykonany przez flush()
+            self._restart_timer = None
+            self._restart_pending_since = None
+        try:
+            subprocess.run(self.restart_cmd, timeout=60)
+        except Exception:
+            logging.exception("DHCP server restart failed")
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import itertools
+import os
+import socket
+import struct
+from typing import Callable, Dict, Iterable, List, Optional
+
+# --------------------------------------------------
+# TARGETS (składnia jak w nmap)
+# --------------------------------------------------
+def _expand_octet(part: str) -> List[int]:
+    values: List[int] = []
+    for item in part.split(","):
+        if "-" in item:
+            lo, hi = item.split("-", 1)
+            values.extend(range(int(lo or 0), int(hi or 255) + 1))
+        else:
+            values.append(int(item))
+    if not values or not all(0 <= v <= 255 for v in values):
+        raise ValueError(part)
+    return values
+
+
+def expand_targets(spec: str) -> List[str]:
+    """
+    Expands the target forms used in scan_config: CIDR ("10.1.20.0/24"),
+    single addresses and nmap octet ranges ("10.1.1.100-250").
+    Anything else nmap would accept (hostnames, "10.1.1.*", octet lists in
+    CIDR) raises ValueError, so callers can hand that range to nmap instead.
+    """
+    targets: List[str] = []
+    for item in spec.split():
+        try:
+            if "/" in item:
+                net = ipaddress.ip_network(item, strict=False)
+                hosts = net.hosts() if net.num_addresses > 2 else iter(net)
+                targets.extend(str(ip) for ip in hosts)
+                continue
+            octets = item.split(".")
+            if len(octets) != 4:
+                raise ValueError(item)
+            combos = itertools.product(*(_expand_octet(o) for o in octets))
+        except ValueError:
+            raise ValueError(f"unsupported target {item!r} in {spec!r} (async engine takes CIDR, "
+                             f"addresses and octet ranges)") from None
+        targets.extend(".".join(map(str, combo)) for combo in combos)
+    return targets
+
+
+def range_members(specs: Iterable[str]) -> Callable[[str], bool]:
+    """Predicate: is an IP inside one of `specs`? Specs only nmap understands match every IP."""
+    ips = set()
+    for spec in specs:
+        try:
+            ips.update(expand_targets(spec))
+        except ValueError:
+            return lambda ip: True
+    return ips.__contains__
+
+# --------------------------------------------------
+# ICMP (nieuprzywilejowany socket datagramowy)
+# --------------------------------------------------
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _echo_request(seq: int) -> bytes:
+    ident = os.getpid() & 0xFFFF
+    payload = b"network-analyze"
+    header = struct.pack("!BBHHH", 8, 0, 0, ident, seq)
+    return struct.pack("!BBHHH", 8, 0, _checksum(header + payload), ident, seq) + payload
+
+
+def _is_echo_reply(data: bytes) -> bool:
+    # Linux oddaje sam nagłówek ICMP, macOS/BSD także nagłówek IP
+    if data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0F) * 4:]
+    return bool(data) and data[0] == 0
+
+
+_icmp_allowed: Optional[bool] = None
+
+
+def icmp_available() -> bool:
+    """True when this process may open unprivileged ICMP datagram sockets."""
+    global _icmp_allowed
+    if _icmp_allowed is None:
+        try:
+            socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP).close()
+            _icmp_allowed = True
+        except OSError:
+            _icmp_allowed = False
+    return _icmp_allowed
+
+
+async def ping(ip: str, timeout: float, seq: int = 1) -> bool:
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    sock.setblocking(False)
+    try:
+        await loop.sock_connect(sock, (ip, 0))
+        await loop.sock_sendall(sock, _echo_request(seq))
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            data = await asyncio.wait_for(loop.sock_recv(sock, 1024), remaining)
+            if _is_echo_reply(data):
+                return True
+    except (asyncio.TimeoutError, OSError):
+        return False
+    finally:
+        sock.close()
+
+# --------------------------------------------------
+# TCP CONNECT
+# --------------------------------------------------
+async def _tcp_port(ip: str, port: int, timeout: float) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except ConnectionRefusedError:
+        return True  # RST = host żyje, port zamknięty
+    except (asyncio.TimeoutError, OSError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def tcp_probe(ip: str, ports: Iterable[int], timeout: float) -> bool:
+    tasks = [asyncio.ensure_future(_tcp_port(ip, p, timeout)) for p in ports]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            if await fut:
+                return True
+        return False
+    finally:
+        for t in tasks:
+            t.cancel()
+
+# --------------------------------------------------
+# SWEEP
+# --------------------------------------------------
+async def sweep_async(
+    targets: Iterable[str],
+    concurrency: int = 128,
+    timeout: float = 1.0,
+    retries: int = 1,
+    ports: Iterable[int] = (22, 80, 443, 445, 3389),
+    deadline: Optional[float] = None,
+    on_host: Optional[Callable[[str, Dict[str, str]], None]] = None,
+    on_timeout: Optional[Callable[[], None]] = None,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Probes every target (ICMP echo when allowed, TCP connect to `ports`
+    otherwise) with at most `concurrency` hosts in flight. Hosts found before
+    `deadline` seconds are returned even if the sweep did not finish (then
+    `on_timeout()` is called); `on_host(ip, info)` is called for each one as
+    soon as it answers.
+    """
+    hosts: Dict[str, Dict[str, str]] = {}
+    sem = asyncio.Semaphore(max(1, concurrency))
+    use_icmp = icmp_available()
+    ports = tuple(ports)
+
+    async def probe(ip: str):
+        async with sem:
+            for attempt in range(max(0, retries) + 1):
+                if use_icmp:
+                    alive = await ping(ip, timeout, attempt + 1)
+                else:
+                    alive = await tcp_probe(ip, ports, timeout)
+                if alive:
+                    hosts[ip] = {"status": "online", "mac": "N/A"}
+                    if on_host is not None:
+                        on_host(ip, hosts[ip])
+                    return
+
+    tasks = [asyncio.ensure_future(probe(ip)) for ip in targets]
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            if on_timeout is not None:
+                on_timeout()
+    return hosts
+
+
+def sweep(spec, **kwargs) -> Dict[str, Dict[str, str]]:
+    """
+    Synchronous entry point: {ip: {"status", "mac"}} like scanner.iter_nmap_hosts().
+    `spec` is a target string (see expand_targets) or already expanded addresses.
+    """
+    targets = expand_targets(spec) if isinstance(spec, str) else list(spec)
+    return asyncio.run(sweep_async(targets, **kwargs))
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from discovery import range_members
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    ip          TEXT PRIMARY KEY,
+    hostname    TEXT,
+    mac         TEXT,
+    status      TEXT,
+    source      TEXT,
+    lease_state TEXT,
+    lease_ends  INTEGER,
+    first_seen  REAL NOT NULL,
+    last_seen   REAL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hosts_mac ON hosts(mac);
+CREATE INDEX IF NOT EXISTS hosts_hostname ON hosts(hostname);
+CREATE INDEX IF NOT EXISTS hosts_status_source ON hosts(status, source);
+CREATE INDEX IF NOT EXISTS hosts_last_seen ON hosts(last_seen);
+CREATE INDEX IF NOT EXISTS hosts_updated_at ON hosts(updated_at);
+"""
+
+UPSERT = """
+INSERT INTO hosts (ip, hostname, mac, status, source, lease_state, lease_ends, first_seen, last_seen, updated_at)
+VALUES (:ip, :hostname, :mac, :status, :source, :lease_state, :lease_ends, :ts, :last_seen, :ts)
+ON CONFLICT(ip) DO UPDATE SET
+    hostname    = excluded.hostname,
+    mac         = CASE WHEN excluded.mac IS NULL OR excluded.mac = 'N/A' THEN hosts.mac ELSE excluded.mac END,
+    status      = excluded.status,
+    source      = excluded.source,
+    lease_state = excluded.lease_state,
+    lease_ends  = excluded.lease_ends,
+    last_seen   = COALESCE(excluded.last_seen, hosts.last_seen),
+    updated_at  = excluded.updated_at
+"""
+
+COLUMNS = ("ip", "hostname", "mac", "status", "source", "lease_state", "lease_ends", "first_seen", "last_seen", "updated_at")
+
+
+def _ip_key(ip: str):
+    try:
+        return list(map(int, ip.split(".")))
+    except ValueError:
+        return [256]
+
+
+class InventoryStore:
+    """
+    Persistent host inventory in SQLite (WAL mode, one connection per thread).
+
+    write_batch() upserts a whole scan in one transaction: first_seen is set
+    once per IP, last_seen moves only while the host is online, and IPs
+    missing from the scan are marked offline - except inside `incomplete`
+    ranges (sweep timed out or failed), where hosts the scan did not see keep
+    their stored row. query() filters through the indexes on mac / hostname /
+    (status, source) / last_seen.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def write_batch(self, hosts: Iterable[Dict], ts: Optional[float] = None, incomplete: Iterable[str] = ()):
+        ts = time.time() if ts is None else ts
+        incomplete = list(incomplete)
+        unswept = range_members(incomplete) if incomplete else None
+        if unswept is not None:
+            hosts = [h for h in hosts if h.get("status") == "online" or not unswept(h["ip"])]
+        rows = [{
+            "ip": h["ip"],
+            "hostname": h.get("hostname"),
+            "mac": h.get("mac"),
+            "status": h.get("status"),
+            "source": h.get("source"),
+            "lease_state": h.get("lease_state"),
+            "lease_ends": h.get("lease_ends"),
+            "last_seen": ts if h.get("status") == "online" else None,
+            "ts": ts,
+        } for h in hosts]
+        conn = self._conn()
+        with conn:
+            conn.executemany(UPSERT, rows)
+            if unswept is None:
+                conn.execute("UPDATE hosts SET status = 'offline' WHERE updated_at < ? AND status != 'offline'", (ts,))
+            else:
+                stale = conn.execute("SELECT ip FROM hosts WHERE updated_at < ? AND status != 'offline'", (ts,))
+                gone = [(ip,) for (ip,) in stale.fetchall() if not unswept(ip)]
+                conn.executemany("UPDATE hosts SET status = 'offline' WHERE ip = ?", gone)
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        source: Optional[str] = None,
+        seen_after: Optional[float] = None,
+        mac: Optional[str] = None,
+        hostname: Optional[str] = None,
+        ip: Optional[str] = None,
+    ) -> List[Dict]:
+        where, params = [], []
+        for column, value in (("ip", ip), ("mac", mac), ("hostname", hostname), ("status", status), ("source", source)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if seen_after is not None:
+            where.append("last_seen > ?")
+            params.append(seen_after)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM hosts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = [dict(r) for r in self._conn().execute(sql, params)]
+        rows.sort(key=lambda r: _ip_key(r["ip"]))
+        return rows
+
+    def last_update(self) -> Optional[float]:
+        row = self._conn().execute("SELECT MAX(updated_at) FROM hosts").fetchone()
+        return row[0] if row else None
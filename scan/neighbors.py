@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import re
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Optional
+
+PROC_ARP = "/proc/net/arp"
+
+_ARP_LINE = re.compile(r'\((\d+\.\d+\.\d+\.\d+)\)\s+at\s+([0-9a-fA-F]{1,2}(?::[0-9a-fA-F]{1,2}){5})')
+
+
+def _normalize_mac(mac: str) -> str:
+    # małe litery, jak w wyjściu `arp -n` - tak zapisuje je dhcp_clients.conf
+    return ":".join(part.zfill(2) for part in mac.split(":")).lower()
+
+
+def read_proc_arp(path: str = PROC_ARP) -> Dict[str, str]:
+    """Parses /proc/net/arp in one pass, skipping incomplete entries."""
+    table: Dict[str, str] = {}
+    with open(path, "r") as f:
+        next(f, None)  # nagłówek
+        for line in f:
+            parts = line.split()
+            if len(parts) < 4:
+                continue
+            ip, flags, mac = parts[0], parts[2], parts[3]
+            if flags == "0x0" or mac == "00:00:00:00:00:00":
+                continue
+            table[ip] = _normalize_mac(mac)
+    return table
+
+
+def read_arp_command() -> Dict[str, str]:
+    """Fallback without procfs (macOS/BSD): a single `arp -an` for the whole table."""
+    arp = shutil.which("arp") or "/sbin/arp"
+    out = subprocess.check_output([arp, "-an"], timeout=5).decode(errors="replace")
+    return {ip: _normalize_mac(mac) for ip, mac in _ARP_LINE.findall(out)}
+
+
+class NeighborTable:
+    """
+    ip -> MAC map of the kernel neighbor table, re-read at most every `ttl`
+    seconds. A miss triggers an early re-read, but not more often than
+    `min_refresh` seconds, so unknown IPs cannot turn into a read per call.
+    """
+
+    def __init__(self, ttl: float = 5.0, min_refresh: float = 1.0):
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self._lock = threading.Lock()
+        self._table: Dict[str, str] = {}
+        self._read_at = 0.0
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            return read_proc_arp()
+        except OSError:
+            pass
+        try:
+            return read_arp_command()
+        except Exception:
+            return {}
+
+    def refresh(self) -> Dict[str, str]:
+        table = self._read()
+        with self._lock:
+            self._table = table
+            self._read_at = time.monotonic()
+        return table
+
+    def snapshot(self, max_age: Optional[float] = None) -> Dict[str, str]:
+        age = time.monotonic() - self._read_at
+        if age > (self.ttl if max_age is None else max_age):
+            return dict(self.refresh())
+        with self._lock:
+            return dict(self._table)
+
+    def get(self, ip: str) -> Optional[str]:
+        table = self.snapshot()
+        mac = table.get(ip)
+        if mac is None and time.monotonic() - self._read_at > self.min_refresh:
+            mac = self.refresh().get(ip)
+        return mac
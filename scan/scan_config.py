@@ -21,11 +21,37 @@ def _get_int(name: str, default: int) -> int:
         return default
 
 
+def _get_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except Exception:
+        return default
+
+
 _load_dotenv()
 
 SCAN_DHCP_RANGE = os.environ.get("SCAN_DHCP_RANGE", "10.1.1.100-250")
 SCAN_LAN_RANGE = os.environ.get("SCAN_LAN_RANGE", "10.1.20.0/24")
 SCAN_WIFI_RANGE = os.environ.get("SCAN_WIFI_RANGE", "10.1.30.0/24")
+SCAN_ENGINE = os.environ.get("SCAN_ENGINE", "nmap").strip().lower()  # nmap | async
+SCAN_MAX_PARALLEL = _get_int("SCAN_MAX_PARALLEL", 3)
+SCAN_RANGE_TIMEOUT = _get_float("SCAN_RANGE_TIMEOUT", 120.0)
+SCAN_INTERVAL_SEC = _get_float("SCAN_INTERVAL_SEC", 120.0)
+SCAN_ARP_TTL = _get_float("SCAN_ARP_TTL", 5.0)
+
+# silnik "async" (scan/discovery.py)
+SCAN_PROBE_CONCURRENCY = _get_int("SCAN_PROBE_CONCURRENCY", 128)
+SCAN_PROBE_TIMEOUT = _get_float("SCAN_PROBE_TIMEOUT", 1.0)
+SCAN_PROBE_RETRIES = _get_int("SCAN_PROBE_RETRIES", 1)
+SCAN_PROBE_PORTS = [
+    int(p) for p in os.environ.get("SCAN_PROBE_PORTS", "22,80,443,445,3389").split(",")
+    if p.strip().isdigit()
+]
+
+SCAN_DNS_TTL = _get_float("SCAN_DNS_TTL", 600.0)
+SCAN_DNS_NEGATIVE_TTL = _get_float("SCAN_DNS_NEGATIVE_TTL", 120.0)
+SCAN_DNS_WORKERS = _get_int("SCAN_DNS_WORKERS", 16)
+SCAN_DNS_DEADLINE = _get_float("SCAN_DNS_DEADLINE", 2.0)
 
 SCAN_DHCP_LEASES = os.environ.get("SCAN_DHCP_LEASES", "/var/lib/dhcp/dhcpd.leases")
 SCAN_DHCP_CONF_CLIENT = os.environ.get("SCAN_DHCP_CONF_CLIENT", "/etc/dhcp/dhcp_clients.conf")
@@ -34,6 +60,29 @@ SCAN_DHCP_CONF_NETWORK_DEVICE = os.environ.get(
     "/etc/dhcp/dhcp_network_device.conf",
 )
 
+SCAN_DATA_DIR = os.environ.get("SCAN_DATA_DIR", str(Path(__file__).resolve().parent / "data"))
+SCAN_CHANGES_LOG = os.environ.get("SCAN_CHANGES_LOG", os.path.join(SCAN_DATA_DIR, "host_changes.jsonl"))
+SCAN_CHANGES_MEMORY = _get_int("SCAN_CHANGES_MEMORY", 5000)
+# po przekroczeniu plik zmian przechodzi do <SCAN_CHANGES_LOG>.1 (0 = bez rotacji)
+SCAN_CHANGES_MAX_BYTES = _get_int("SCAN_CHANGES_MAX_BYTES", 10 * 1024 * 1024)
+SCAN_DB_PATH = os.environ.get("SCAN_DB_PATH", os.path.join(SCAN_DATA_DIR, "inventory.sqlite3"))
+
+SCAN_DHCP_RESTART_CMD = os.environ.get("SCAN_DHCP_RESTART_CMD", "sudo systemctl restart isc-dhcp-server").split()
+SCAN_DHCP_RESTART_DEBOUNCE = _get_float("SCAN_DHCP_RESTART_DEBOUNCE", 5.0)
+# ciągła seria rejestracji nie odsuwa restartu dalej niż o tyle od pierwszej zmiany
+SCAN_DHCP_RESTART_MAX_DELAY = _get_float("SCAN_DHCP_RESTART_MAX_DELAY", 30.0)
+
 SCAN_REGISTER_PASSWORD = os.environ.get("SCAN_REGISTER_PASSWORD", "")
 SCAN_HOST = os.environ.get("SCAN_HOST", "0.0.0.0")
 SCAN_PORT = _get_int("SCAN_PORT", 5000)
+
+# serwer HTTP: waitress (pula wątków) albo dev (wbudowany serwer Flaska)
+SCAN_SERVER_MODE = os.environ.get("SCAN_SERVER_MODE", "waitress").strip().lower()
+SCAN_SERVER_THREADS = _get_int("SCAN_SERVER_THREADS", 8)
+SCAN_SERVER_BACKLOG = _get_int("SCAN_SERVER_BACKLOG", 64)
+SCAN_SERVER_CONNECTION_LIMIT = _get_int("SCAN_SERVER_CONNECTION_LIMIT", 100)
+SCAN_SERVER_KEEPALIVE_SEC = _get_int("SCAN_SERVER_KEEPALIVE_SEC", 120)
+# skany na osobnym wątku; /api/hosts czeka na wynik najwyżej SCAN_REQUEST_WAIT s,
+# /api/hosts/stream najwyżej SCAN_TIMEOUT s (potem "done" z poprzednim inwentarzem)
+SCAN_REQUEST_WAIT = _get_float("SCAN_REQUEST_WAIT", 30.0)
+SCAN_TIMEOUT = _get_float("SCAN_TIMEOUT", 600.0)
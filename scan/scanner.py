@@ -1,8 +1,21 @@
 from flask import Flask, jsonify, render_template, request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
+import atexit
+import logging
+import signal
 import subprocess
+import calendar
+import json
+import os
+import queue
 import re
 import socket
 import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
 from pathlib import Path
 
 SCAN_DIR = Path(__file__).resolve().parent
@@ -10,6 +23,10 @@ if str(SCAN_DIR) not in sys.path:
     sys.path.insert(0, str(SCAN_DIR))
 
 import scan_config as config
+import discovery
+from dhcp_config import DhcpConfigManager
+from inventory_store import InventoryStore
+from neighbors import NeighborTable
 
 app = Flask(__name__)
 
@@ -24,15 +41,11 @@ def read_file(path):
         return ""
 
 
+neighbor_table = NeighborTable(config.SCAN_ARP_TTL)
+
+
 def get_mac(ip):
-    try:
-        out = subprocess.check_output(["/sbin/arp", "-n", ip]).decode()
-        for line in out.splitlines():
-            if ip in line:
-                return line.split()[2]
-    except Exception:
-        pass
-    return "N/A"
+    return neighbor_table.get(ip) or "N/A"
 
 
 def get_reverse_dns(ip):
@@ -41,30 +54,151 @@ def get_reverse_dns(ip):
     except Exception:
         return None
 
+
+class ReverseDNSCache:
+    """
+    get_reverse_dns() behind a TTL cache (misses are cached with a shorter
+    TTL) and a bounded thread pool. lookup_many() runs the lookups
+    concurrently and waits at most `deadline` seconds; lookups still running
+    after that report None now and land in the cache for the next call.
+    """
+
+    def __init__(self, ttl, negative_ttl, workers, deadline):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.deadline = deadline
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rdns")
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._inflight = {}
+
+    def _resolve(self, ip):
+        name = get_reverse_dns(ip)
+        expires = time.monotonic() + (self.ttl if name else self.negative_ttl)
+        with self._lock:
+            self._cache[ip] = (name, expires)
+            self._inflight.pop(ip, None)
+        return name
+
+    def lookup_many(self, ips, deadline=None):
+        now = time.monotonic()
+        names = {}
+        pending = {}
+        with self._lock:
+            for ip in ips:
+                hit = self._cache.get(ip)
+                if hit and hit[1] > now:
+                    names[ip] = hit[0]
+                    continue
+                fut = self._inflight.get(ip)
+                if fut is None:
+                    fut = self._inflight[ip] = self._pool.submit(self._resolve, ip)
+                pending[ip] = fut
+
+        if pending:
+            wait(pending.values(), timeout=self.deadline if deadline is None else deadline)
+        for ip, fut in pending.items():
+            names[ip] = fut.result() if fut.done() else None
+        return names
+
+    def lookup(self, ip, deadline=None):
+        return self.lookup_many([ip], deadline)[ip]
+
+
+rdns = ReverseDNSCache(
+    config.SCAN_DNS_TTL,
+    config.SCAN_DNS_NEGATIVE_TTL,
+    config.SCAN_DNS_WORKERS,
+    config.SCAN_DNS_DEADLINE,
+)
+
 # --------------------------------------------------
 # DHCP LEASES — NAJWAŻNIEJSZE
 # --------------------------------------------------
-def parse_dhcp_leases():
+class LeaseReader:
     """
-    ZAWSZE bierze NAJNOWSZY lease w pliku
-    """
-    leases = {}
-    content = read_file(config.SCAN_DHCP_LEASES)
+    Incremental reader of dhcpd.leases.
 
-    blocks = re.findall(
-        r'lease\s+(\S+)\s*{([^}]*)}',
-        content,
-        re.DOTALL
-    )
+    Remembers the byte offset and inode of the file, parses only the lease
+    blocks appended since the previous poll and starts from scratch when dhcpd
+    rewrites the file (new inode after compaction, or a shorter file).
+    An unfinished block at the end of the file is kept until it is complete.
+    """
 
-    for ip, block in blocks:
-        m = re.search(r'client-hostname\s+"([^"]+)"', block)
+    BLOCK = re.compile(rb'lease\s+(\S+)\s*{([^}]*)}', re.DOTALL)
+    HOSTNAME = re.compile(r'client-hostname\s+"([^"]+)"')
+    STATE = re.compile(r'^\s*binding\s+state\s+(\S+);', re.MULTILINE)
+    TIMES = re.compile(r'^\s*(starts|ends)\s+(?:\d\s+(\S+\s+\S+)|never);', re.MULTILINE)
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, inode):
+        self._inode = inode
+        self._offset = 0
+        self._pending = b""
+        self.hostnames = {}
+        self.leases = {}
+
+    def poll(self):
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                self._reset(None)
+                return
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self._reset(st.st_ino)
+            if st.st_size == self._offset:
+                return
+            try:
+                with open(self.path, "rb") as f:
+                    f.seek(self._offset)
+                    chunk = f.read(st.st_size - self._offset)
+            except OSError:
+                return
+            self._offset += len(chunk)
+
+            buf = self._pending + chunk
+            cut = buf.rfind(b"}") + 1
+            self._pending = buf[cut:]
+            for ip, block in self.BLOCK.findall(buf[:cut]):
+                self._apply(ip.decode("ascii", "replace"), block.decode("utf-8", "replace"))
+
+    def _apply(self, ip, block):
+        lease = {"hostname": None, "state": None, "starts": None, "ends": None}
+        m = self.HOSTNAME.search(block)
+        if m and m.group(1).strip():
+            lease["hostname"] = m.group(1).strip()
+            self.hostnames[ip] = lease["hostname"]  # ostatni = aktualny
+        m = self.STATE.search(block)
         if m:
-            hostname = m.group(1).strip()
-            if hostname:
-                leases[ip] = hostname  # ostatni = aktualny
+            lease["state"] = m.group(1)
+        for key, stamp in self.TIMES.findall(block):
+            if stamp:
+                try:
+                    lease[key] = calendar.timegm(time.strptime(stamp, "%Y/%m/%d %H:%M:%S"))
+                except ValueError:
+                    pass
+        self.leases[ip] = lease
+
+    def snapshot(self):
+        """Polls the file and returns copies of (ip -> hostname, ip -> lease)."""
+        self.poll()
+        with self._lock:
+            return dict(self.hostnames), dict(self.leases)
+
 
-    return leases
+lease_reader = LeaseReader(config.SCAN_DHCP_LEASES)
+
+
+def parse_dhcp_leases():
+    """
+    ZAWSZE bierze NAJNOWSZY lease w pliku
+    """
+    return lease_reader.snapshot()[0]
 
 # --------------------------------------------------
 # DHCP CONFIG (statyczne)
@@ -91,35 +225,145 @@ def parse_dhcp_config():
 # --------------------------------------------------
 # NETWORK SCAN (TYLKO status + MAC)
 # --------------------------------------------------
-def scan_network(subnet):
-    hosts = {}
-    cmd = ['nmap', '-sn', '-T4', '--max-retries', '2', subnet]
+def _parse_nmap_host(elem):
+    status = elem.find("status")
+    if status is None or status.get("state") != "up":
+        return None
+    ip = mac = None
+    for addr in elem.iter("address"):
+        if addr.get("addrtype") == "ipv4":
+            ip = addr.get("addr")
+        elif addr.get("addrtype") == "mac":
+            mac = addr.get("addr")
+    if not ip:
+        return None
+    return ip, {"status": "online", "mac": mac or "N/A"}
+
 
+def iter_nmap_hosts(subnet, timeout=None, stop=None, on_timeout=None):
+    """
+    Runs `nmap -sn -oX -` and parses the XML incrementally, yielding
+    (ip, {"status", "mac"}) for every host as soon as nmap reports it.
+    nmap is killed after `timeout` seconds (then `on_timeout()` is called),
+    when `stop` is set, or when the caller stops iterating.
+    """
+    cmd = ['nmap', '-sn', '-T4', '--max-retries', '2', '-oX', '-', subnet]
     try:
-        res = subprocess.run(cmd, capture_output=True, text=True)
-        current_ip = None
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return
 
-        for line in res.stdout.splitlines():
-            if "Nmap scan report for" in line:
-                current_ip = line.split()[-1].strip("()")
-                hosts[current_ip] = {"status": "online", "mac": "N/A"}
+    expired = threading.Event()
 
-            elif "MAC Address:" in line and current_ip:
-                hosts[current_ip]["mac"] = line.split("MAC Address: ")[1].split()[0]
+    def expire():
+        expired.set()
+        proc.kill()
 
-    except Exception:
+    killer = threading.Timer(timeout, expire) if timeout else None
+    if killer:
+        killer.daemon = True
+        killer.start()
+    parser = ET.XMLPullParser(events=("end",))
+    try:
+        for line in proc.stdout:
+            if stop is not None and stop.is_set():
+                break
+            parser.feed(line)
+            for _, elem in parser.read_events():
+                if elem.tag != "host":
+                    continue
+                host = _parse_nmap_host(elem)
+                elem.clear()
+                if host:
+                    yield host
+    except ET.ParseError:
         pass
+    finally:
+        if killer:
+            killer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        if expired.is_set() and on_timeout is not None:
+            on_timeout()
+
+
+def iter_scan_ranges(subnets, incomplete=None):
+    """
+    Sweeps all subnets concurrently (at most SCAN_MAX_PARALLEL at a time, each
+    stopped after SCAN_RANGE_TIMEOUT) and yields (ip, {"status", "mac"}) as
+    hosts are discovered, so the total time is bounded by the slowest subnet.
+    Subnets whose sweep timed out or failed are added to the `incomplete` set.
+    """
+    subnets = [s for s in subnets if s]
+    if not subnets:
+        return
+    found = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def async_targets(subnet):
+        try:
+            return discovery.expand_targets(subnet)
+        except ValueError as e:
+            logging.warning("%s; falling back to nmap for this range", e)
+            return None
+
+    def timed_out(subnet):
+        logging.warning("Sweep of %s stopped after SCAN_RANGE_TIMEOUT=%ss", subnet, config.SCAN_RANGE_TIMEOUT)
+        if incomplete is not None:
+            incomplete.add(subnet)
+
+    def sweep(subnet):
+        try:
+            targets = async_targets(subnet) if config.SCAN_ENGINE == "async" else None
+            if targets is not None:
+                discovery.sweep(
+                    targets,
+                    concurrency=config.SCAN_PROBE_CONCURRENCY,
+                    timeout=config.SCAN_PROBE_TIMEOUT,
+                    retries=config.SCAN_PROBE_RETRIES,
+                    ports=config.SCAN_PROBE_PORTS,
+                    deadline=config.SCAN_RANGE_TIMEOUT,
+                    on_host=lambda ip, info: found.put((ip, info)),
+                    on_timeout=lambda: timed_out(subnet),
+                )
+            else:
+                for host in iter_nmap_hosts(subnet, config.SCAN_RANGE_TIMEOUT, stop, lambda: timed_out(subnet)):
+                    found.put(host)
+        except Exception:
+            logging.exception("Sweep of %s failed", subnet)
+            if incomplete is not None:
+                incomplete.add(subnet)
+        finally:
+            found.put(done)
+
+    workers = max(1, min(config.SCAN_MAX_PARALLEL, len(subnets)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sweep")
+    try:
+        for subnet in subnets:
+            pool.submit(sweep, subnet)
+        remaining = len(subnets)
+        while remaining:
+            item = found.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
+    finally:
+        stop.set()
+        pool.shutdown(wait=False)
 
-    return hosts
 
 # --------------------------------------------------
 # HOSTNAME RESOLUTION — JEDNO MIEJSCE
 # --------------------------------------------------
-def resolve_hostname(ip, lease_hosts, static_hosts, seen):
+def resolve_hostname(ip, lease_hosts, static_hosts, seen, dns_names=None):
     """
     1. DHCP LEASE
     2. DHCP CONF
-    3. reverse DNS
+    3. reverse DNS (z dns_names, jeśli podane - wynik rdns.lookup_many)
     4. fallback host-x-x-x-x
     """
 
@@ -132,8 +376,10 @@ def resolve_hostname(ip, lease_hosts, static_hosts, seen):
         hostname = static_hosts[ip]
 
     # 3. reverse dns
+    elif dns_names is not None:
+        hostname = dns_names.get(ip)
     else:
-        hostname = get_reverse_dns(ip)
+        hostname = rdns.lookup(ip)
 
     # 4. fallback
     if not hostname or hostname.lower() == "for":
@@ -152,16 +398,34 @@ def resolve_hostname(ip, lease_hosts, static_hosts, seen):
 # --------------------------------------------------
 # AGGREGATOR
 # --------------------------------------------------
-def get_host_info():
-    lease_hosts = parse_dhcp_leases()
+def iter_host_info():
+    """
+    Progressive scan. Yields {"type": "host", "host": {...}} for every online
+    host as soon as a sweep reports it (hostname from DHCP data or the DNS
+    cache, without waiting for lookups), then {"type": "done", "hosts": [...],
+    "incomplete": [...]} with the complete, sorted inventory and the ranges
+    whose sweep did not finish (their missing hosts are only presumed offline).
+    """
+    lease_hosts, leases = lease_reader.snapshot()
     static_cfg = parse_dhcp_config()
 
     static_hosts = {h["ip"]: h["hostname"] for h in static_cfg}
 
     active = {}
-    active.update(scan_network(config.SCAN_DHCP_RANGE))
-    active.update(scan_network(config.SCAN_LAN_RANGE))
-    active.update(scan_network(config.SCAN_WIFI_RANGE))
+    incomplete = set()
+    ranges = [config.SCAN_DHCP_RANGE, config.SCAN_LAN_RANGE, config.SCAN_WIFI_RANGE]
+    for ip, info in iter_scan_ranges(ranges, incomplete):
+        active[ip] = info
+        name = lease_hosts.get(ip) or static_hosts.get(ip) or rdns.lookup(ip, deadline=0)
+        yield {"type": "host", "host": {
+            "hostname": name or f"host-{ip.replace('.', '-')}",
+            "ip": ip,
+            "status": "online",
+            "mac": info["mac"],
+        }}
+
+    # nmap bez roota nie podaje MAC - uzupełniamy z tablicy ARP (świeżo po skanie)
+    arp = neighbor_table.snapshot(max_age=0)
 
     seen = set()
     result = {}
@@ -169,16 +433,25 @@ def get_host_info():
     # wszystkie IP jakie znamy
     all_ips = set(lease_hosts) | set(static_hosts) | set(active)
 
+    # reverse DNS równolegle, tylko dla IP bez nazwy z DHCP
+    dns_names = rdns.lookup_many([ip for ip in all_ips if ip not in lease_hosts and ip not in static_hosts])
+
     for ip in sorted(all_ips, key=lambda x: list(map(int, x.split(".")))):
-        hostname = resolve_hostname(ip, lease_hosts, static_hosts, seen)
+        hostname = resolve_hostname(ip, lease_hosts, static_hosts, seen, dns_names)
 
         result[ip] = {
             "hostname": hostname,
             "ip": ip,
             "status": "online" if ip in active else "offline",
-            "mac": active.get(ip, {}).get("mac", "N/A"),
+            "mac": (
+                "N/A" if ip not in active else
+                active[ip]["mac"] if active[ip]["mac"] != "N/A" else
+                arp.get(ip, "N/A")
+            ),
             "disk": "N/A",
             "ram": "N/A",
+            "lease_state": leases.get(ip, {}).get("state"),
+            "lease_ends": leases.get(ip, {}).get("ends"),
             "source": (
                 "DHCP" if ip in lease_hosts else
                 "LAN" if ip.startswith("10.1.20.") else
@@ -187,42 +460,379 @@ def get_host_info():
             )
         }
 
-    return list(result.values())
+    yield {"type": "done", "hosts": list(result.values()), "incomplete": sorted(incomplete)}
+
+
+def get_host_info():
+    for event in iter_host_info():
+        if event["type"] == "done":
+            return event["hosts"]
+    return []
+
+# --------------------------------------------------
+# CHANGE LOG (różnice między skanami)
+# --------------------------------------------------
+class HostChangeLog:
+    """
+    Keeps the previous inventory and turns each new one into change events:
+    appeared / disappeared (online <-> offline), ip_changed (a MAC came up on
+    another IP), mac_changed and hostname_changed. Hosts are compared as
+    (hostname, mac, status) tuples, so unchanged hosts cost one lookup.
+
+    Events get consecutive ids and are appended to a JSON-lines file, which is
+    rotated to `<path>.1` (one generation) once it grows past `max_bytes`; the
+    newest `keep` stay in memory, where since() is a slice by id. The first
+    scan after start only sets the baseline.
+    """
+
+    def __init__(self, path, keep, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._prev = None
+        self._events = deque(maxlen=max(1, keep))
+        self._last_id = 0
+        self._load()
+
+    def _files(self):
+        return (self.path + ".1", self.path)
+
+    def _load(self):
+        for path in self._files():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            self._events.append(json.loads(line))
+                        except ValueError:
+                            continue
+            except OSError:
+                continue
+        if self._events:
+            self._last_id = self._events[-1]["id"]
+
+    def seed(self, hosts):
+        """Sets the baseline without emitting events (e.g. the stored inventory)."""
+        with self._lock:
+            if self._prev is None:
+                self._prev = {h["ip"]: (h["hostname"], h["mac"], h["status"]) for h in hosts}
+
+    def update(self, hosts, incomplete=()):
+        """
+        Diffs `hosts` against the previous inventory. Hosts in `incomplete`
+        ranges (sweep timed out or failed) that were online and are not seen
+        now keep their previous state instead of being reported as gone.
+        """
+        cur = {h["ip"]: (h["hostname"], h["mac"], h["status"]) for h in hosts}
+        unswept = discovery.range_members(incomplete) if incomplete else None
+        with self._lock:
+            prev = self._prev
+            if prev is not None and unswept is not None:
+                for ip, old in prev.items():
+                    if old[2] == "online" and cur.get(ip, old[:2] + ("offline",))[2] != "online" and unswept(ip):
+                        cur[ip] = old
+            self._prev = cur
+            if prev is None:
+                return []
+
+            changes = []
+            moved_from = {mac: ip for ip, (_, mac, st) in prev.items() if st == "online" and mac != "N/A"}
+            for ip, rec in cur.items():
+                old = prev.get(ip)
+                if old == rec:
+                    continue
+                name, mac, status = rec
+                was_online = old is not None and old[2] == "online"
+                if status == "online" and not was_online:
+                    changes.append(("appeared", ip, rec, None, None))
+                    src = moved_from.get(mac)
+                    if src and src != ip and cur.get(src, ("", "", "offline"))[1] != mac:
+                        changes.append(("ip_changed", ip, rec, src, ip))
+                elif was_online and status != "online":
+                    changes.append(("disappeared", ip, (name, old[1], status), None, None))
+                if old is not None:
+                    if "N/A" not in (old[1], mac) and old[1] != mac:
+                        changes.append(("mac_changed", ip, rec, old[1], mac))
+                    if old[0] != name:
+                        changes.append(("hostname_changed", ip, rec, old[0], name))
+            for ip, old in prev.items():
+                if ip not in cur and old[2] == "online":
+                    changes.append(("disappeared", ip, (old[0], old[1], "offline"), None, None))
+
+            now = round(time.time(), 3)
+            events = []
+            for kind, ip, (name, mac, _), old_value, new_value in changes:
+                self._last_id += 1
+                event = {"id": self._last_id, "ts": now, "type": kind, "ip": ip, "hostname": name, "mac": mac}
+                if old_value is not None or new_value is not None:
+                    event["old"] = old_value
+                    event["new"] = new_value
+                events.append(event)
+            self._append(events)
+            self._events.extend(events)
+            return events
+
+    def _append(self, events):
+        if not events:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e) + "\n" for e in events))
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            if self.max_bytes > 0 and size > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+        except OSError:
+            logging.exception("Cannot append to %s", self.path)
+
+    def since(self, since_id, limit=1000):
+        """
+        Events with id > since_id (oldest first), at most `limit`. Ids are
+        consecutive, so a first event newer than since_id + 1 means the ones
+        in between were already rotated out.
+        """
+        with self._lock:
+            if since_id >= self._last_id:
+                return []
+            first = self._events[0]["id"] if self._events else self._last_id + 1
+            if since_id + 1 >= first:
+                start = since_id + 1 - first
+                return list(islice(self._events, start, start + limit))
+        # starsze niż pamięć - z plików (najpierw rotowany)
+        events = []
+        for path in self._files():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            e = json.loads(line)
+                        except ValueError:
+                            continue
+                        if e["id"] > since_id:
+                            events.append(e)
+                            if len(events) >= limit:
+                                return events
+            except OSError:
+                continue
+        return events
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+
+change_log = HostChangeLog(config.SCAN_CHANGES_LOG, config.SCAN_CHANGES_MEMORY, config.SCAN_CHANGES_MAX_BYTES)
+
+try:
+    store = InventoryStore(config.SCAN_DB_PATH)
+except Exception:
+    logging.exception("Inventory store unavailable: %s", config.SCAN_DB_PATH)
+    store = None
+
+
+def stored_inventory():
+    """Inventory persisted by the last run as (hosts, updated_at), or (None, None)."""
+    if store is None:
+        return None, None
+    try:
+        rows = store.query()
+    except Exception:
+        logging.exception("Inventory store read failed")
+        return None, None
+    if not rows:
+        return None, None
+    return [dict(r, disk="N/A", ram="N/A") for r in rows], store.last_update()
+
+# --------------------------------------------------
+# INVENTORY CACHE (skan w tle)
+# --------------------------------------------------
+class InventoryCache:
+    """
+    Runs iter_host_info() every `interval` seconds and keeps the last inventory
+    in memory. Scans always run on `executor`, never on a request thread;
+    refresh() coalesces concurrent callers: while a scan is in flight,
+    everybody waits for that scan instead of starting another one.
+    """
+
+    def __init__(self, interval, executor):
+        self.interval = max(1.0, interval)
+        self.executor = executor
+        self._cond = threading.Condition()
+        self._hosts = None
+        self._scanned_at = None
+        self._last_attempt = 0.0
+        self._scanning = False
+        self._completed = 0
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            # po restarcie: od razu ostatni zapisany stan, skan odświeży go w tle
+            hosts, updated_at = stored_inventory()
+            if hosts is not None and self._hosts is None:
+                self._hosts, self._scanned_at = hosts, updated_at
+                change_log.seed(hosts)
+            self._thread = threading.Thread(target=self._run, name="inventory-scan", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            wait = self.interval - (time.monotonic() - self._last_attempt)
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            self.refresh()
+
+    def _begin(self):
+        """Marks a scan as started; False if one is already running. Caller holds _cond."""
+        if self._scanning:
+            return False
+        self._scanning = True
+        self._last_attempt = time.monotonic()
+        return True
+
+    def _scan(self):
+        self._scan_events(None)
+
+    def refresh(self, timeout=None):
+        """
+        Scans now (or joins the scan already running) and waits up to `timeout`
+        seconds for it; returns (hosts, scanned_at) - the previous inventory if
+        the scan is still running.
+        """
+        with self._cond:
+            done = self._completed
+            if self._begin():
+                self.executor.submit(self._scan)
+            self._cond.wait_for(lambda: self._completed > done, timeout)
+            return self._hosts, self._scanned_at
+
+    @property
+    def scanning(self):
+        return self._scanning
+
+    def _merge_unswept(self, hosts, incomplete):
+        """
+        Keeps the previous entries of hosts in `incomplete` ranges that were
+        online before and were not seen now - a timed-out sweep proves nothing.
+        """
+        with self._cond:
+            prev = self._hosts
+        if not incomplete or not prev:
+            return hosts
+        unswept = discovery.range_members(incomplete)
+        seen = {h["ip"]: h for h in hosts if h["status"] == "online"}
+        merged = {h["ip"]: h for h in hosts}
+        for h in prev:
+            if h["status"] == "online" and h["ip"] not in seen and unswept(h["ip"]):
+                merged[h["ip"]] = h
+        return sorted(merged.values(), key=lambda h: list(map(int, h["ip"].split("."))))
+
+    def _finish(self, hosts, incomplete=()):
+        if hosts is not None:
+            if store is not None:
+                try:
+                    # surowy wynik skanu - write_batch sam pomija niedoskanowane zakresy
+                    store.write_batch(hosts, incomplete=incomplete)
+                except Exception:
+                    logging.exception("Inventory store write failed")
+            hosts = self._merge_unswept(hosts, incomplete)
+            try:
+                change_log.update(hosts, incomplete)
+            except Exception:
+                logging.exception("Change log update failed")
+        with self._cond:
+            if hosts is not None:
+                self._hosts = hosts
+                self._scanned_at = time.time()
+            self._scanning = False
+            self._completed += 1
+            self._cond.notify_all()
+
+    def stream(self, timeout=None):
+        """
+        Like refresh(), but yields the iter_host_info() events of the scan.
+        A caller joining a scan that is already running only gets its final
+        "done" event. Waits at most `timeout` seconds: after that the last
+        event is a "done" with the previous inventory and "scanning": true.
+        """
+        with self._cond:
+            joined = not self._begin()
+        if joined:
+            hosts, _ = self.refresh(timeout)
+            yield {"type": "done", "hosts": hosts or [], "scanning": self._scanning}
+            return
+
+        # skan na executorze, request tylko czyta kolejkę; zerwane połączenie
+        # nie przerywa skanu - jego wynik i tak trafia do inwentarza
+        events = queue.Queue()
+        self.executor.submit(self._scan_events, events)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                event = events.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                with self._cond:
+                    hosts = self._hosts
+                yield {"type": "done", "hosts": hosts or [], "scanning": True}
+                return
+            if event is None:
+                return
+            yield event
+
+    def _scan_events(self, events):
+        done = {"hosts": None}
+        try:
+            for event in iter_host_info():
+                if event["type"] == "done":
+                    done = event
+                if events is not None:
+                    events.put(event)
+        except Exception:
+            logging.exception("Host scan failed")
+        finally:
+            self._finish(done["hosts"], done.get("incomplete", ()))
+            if events is not None:
+                events.put(None)
+
+    def get(self, timeout=None):
+        """Last inventory, scanning first (up to `timeout`) if nothing has been scanned yet."""
+        self.start()
+        with self._cond:
+            if self._hosts is not None:
+                return self._hosts, self._scanned_at
+        return self.refresh(timeout)
+
+
+# osobny wątek na skany - wątki serwera HTTP zostają dla lekkich tras; jeden
+# wystarczy, bo InventoryCache nigdy nie uruchamia dwóch skanów naraz
+scan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan")
+inventory = InventoryCache(config.SCAN_INTERVAL_SEC, scan_executor)
 
 # --------------------------------------------------
 # DHCP UPDATE
 # --------------------------------------------------
-def update_dhcp_entry(hostname, mac, iface_octet, client_id):
-    content = read_file(config.SCAN_DHCP_CONF_CLIENT)
-    ip = f"10.1.{iface_octet}.{client_id}"
+dhcp_clients = DhcpConfigManager(
+    config.SCAN_DHCP_CONF_CLIENT,
+    config.SCAN_DHCP_RESTART_CMD,
+    config.SCAN_DHCP_RESTART_DEBOUNCE,
+    config.SCAN_DHCP_RESTART_MAX_DELAY,
+)
+# restart czekający na debounce nie może zginąć razem z procesem
+atexit.register(dhcp_clients.flush)
 
-    pattern = re.compile(r"host\s+(\S+)\s*{[^}]*}", re.DOTALL)
-    new = []
-    updated = False
-
-    for m in pattern.finditer(content):
-        entry = m.group(0)
-        if mac in entry or ip in entry:
-            new.append(
-                f"host {hostname} {{\n"
-                f"    hardware ethernet {mac};\n"
-                f"    fixed-address {ip};\n"
-                f"}}\n"
-            )
-            updated = True
-        else:
-            new.append(entry)
-
-    if not updated:
-        new.append(
-            f"host {hostname} {{\n"
-            f"    hardware ethernet {mac};\n"
-            f"    fixed-address {ip};\n"
-            f"}}\n"
-        )
 
-    with open(config.SCAN_DHCP_CONF_CLIENT, "w") as f:
-        f.write("\n".join(new))
+def update_dhcp_entry(hostname, mac, iface_octet, client_id):
+    """
+    Zapis atomowy + jeden (opóźniony) restart isc-dhcp-server dla serii rejestracji.
+    ValueError dla nazw/adresów, których dhcpd by nie przyjął.
+    """
+    ip = f"10.1.{iface_octet}.{client_id}"
+    dhcp_clients.register(hostname, mac, ip)
 
 # --------------------------------------------------
 # ROUTES
@@ -235,7 +845,7 @@ def index_block():
         client_ip=ip,
         client_mac=get_mac(ip),
         client_id=ip.split(".")[-1],
-        detected_hostname=get_reverse_dns(ip) or ""
+        detected_hostname=rdns.lookup(ip) or ""
     )
 
 
@@ -244,9 +854,80 @@ def display():
     return render_template("index.html")
 
 
+def _filter_hosts(hosts, scanned_at, status=None, source=None, seen_after=None, mac=None, hostname=None):
+    """
+    InventoryStore.query() filters applied to the cached inventory. The cache
+    has no last_seen: hosts online in the last scan count as seen at scanned_at.
+    """
+    result = []
+    for h in hosts:
+        if any(value and h.get(key) != value
+               for key, value in (("status", status), ("source", source), ("mac", mac), ("hostname", hostname))):
+            continue
+        if seen_after is not None and not (h.get("status") == "online" and scanned_at and scanned_at > seen_after):
+            continue
+        result.append(h)
+    return result
+
+
 @app.route("/api/hosts")
 def api_hosts():
-    return jsonify({"hosts": get_host_info()})
+    filters = {
+        "status": request.args.get("status"),
+        "source": request.args.get("source"),
+        "seen_after": request.args.get("seen_after", type=float),
+        "mac": request.args.get("mac"),
+        "hostname": request.args.get("hostname"),
+    }
+    filtered = any(v is not None for v in filters.values())
+    if store is not None and filtered:
+        # zapytanie z filtrami idzie do indeksów SQLite, bez skanowania
+        scanned_at = store.last_update()
+        return jsonify({
+            "hosts": [dict(r, disk="N/A", ram="N/A") for r in store.query(**filters)],
+            "scanned_at": scanned_at,
+            "age": round(time.time() - scanned_at, 1) if scanned_at else None,
+        })
+
+    if request.args.get("refresh") in ("1", "true", "yes"):
+        hosts, scanned_at = inventory.refresh(config.SCAN_REQUEST_WAIT)
+    else:
+        hosts, scanned_at = inventory.get(config.SCAN_REQUEST_WAIT)
+    if filtered:
+        # bez SQLite - te same filtry na inwentarzu z pamięci
+        hosts = _filter_hosts(hosts or [], scanned_at, **filters)
+    # scanning=true: skan trwa dłużej niż SCAN_REQUEST_WAIT, dane są z poprzedniego
+    return jsonify({
+        "hosts": hosts or [],
+        "scanned_at": scanned_at,
+        "age": round(time.time() - scanned_at, 1) if scanned_at else None,
+        "scanning": inventory.scanning,
+    })
+
+
+@app.route("/api/hosts/stream")
+def api_hosts_stream():
+    """NDJSON: one {"type": "host"} line per discovered host, then {"type": "done"}."""
+    def gen():
+        for event in inventory.stream(config.SCAN_TIMEOUT):
+            yield json.dumps(event) + "\n"
+    return app.response_class(gen(), mimetype="application/x-ndjson")
+
+
+@app.route("/api/hosts/changes")
+def api_hosts_changes():
+    since = request.args.get("since", 0, type=int)
+    limit = min(max(request.args.get("limit", 1000, type=int), 1), 10000)
+    events = change_log.since(since, limit)
+    last_id = events[-1]["id"] if events else change_log.last_id
+    # ids są kolejne - luka za `since` to zdarzenia usunięte z pamięci i z plików;
+    # truncated=true: klient powinien przeładować pełne /api/hosts
+    first = events[0]["id"] if events else last_id + 1
+    return jsonify({
+        "events": events,
+        "last_id": last_id,
+        "truncated": since < last_id and first > since + 1,
+    })
 
 
 @app.route("/", methods=["POST"])
@@ -259,16 +940,48 @@ def register_host():
     iface_map = {"LAN": 20, "WiFi": 30, "VPN": 40}
     iface = iface_map.get(request.form.get("interface"), 20)
 
-    update_dhcp_entry(
-        request.form.get("hostname"),
-        get_mac(request.remote_addr),
-        iface,
-        request.form.get("client_id")
-    )
+    try:
+        update_dhcp_entry(
+            request.form.get("hostname"),
+            get_mac(request.remote_addr),
+            iface,
+            request.form.get("client_id")
+        )
+    except ValueError as e:
+        return str(e), 400
 
-    subprocess.run(["sudo", "systemctl", "restart", "isc-dhcp-server"])
     return "OK"
 
 # --------------------------------------------------
+def serve():
+    """
+    SCAN_SERVER_MODE=waitress: bounded pool of SCAN_SERVER_THREADS request
+    workers (scans run on scan_executor), backlog and keep-alive from
+    scan_config. "dev" or missing waitress: Flask's threaded server.
+    SIGTERM exits through SystemExit, so atexit handlers (pending dhcpd
+    restart) still run.
+    """
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    inventory.start()
+    if config.SCAN_SERVER_MODE == "waitress":
+        try:
+            from waitress import serve as waitress_serve
+        except ImportError:
+            logging.warning("waitress not installed - falling back to the Flask development server")
+        else:
+            waitress_serve(
+                app,
+                host=config.SCAN_HOST,
+                port=config.SCAN_PORT,
+                threads=max(1, config.SCAN_SERVER_THREADS),
+                backlog=max(1, config.SCAN_SERVER_BACKLOG),
+                connection_limit=max(1, config.SCAN_SERVER_CONNECTION_LIMIT),
+                channel_timeout=config.SCAN_SERVER_KEEPALIVE_SEC,
+                ident="scanner",
+            )
+            return
+    app.run(host=config.SCAN_HOST, port=config.SCAN_PORT, threaded=True)
+
+
 if __name__ == "__main__":
-    app.run(host=config.SCAN_HOST, port=config.SCAN_PORT)
+    serve()